@@ -14,7 +14,8 @@ const char* password = "GoFuckYourself";
 // UDP Configuration
 WiFiUDP udp;
 const int udpPort = 8888;
-const int packetSize = 3 + (NUM_LEDS * 3); // strip_id + brightness + LED data
+const int legacyPacketSize = 3 + (NUM_LEDS * 3); // strip_id + brightness + LED data
+const int packetSize = legacyPacketSize > 1472 ? legacyPacketSize : 1472; // Also fits a full-MTU extended packet
 
 // LED strip
 CRGB leds[NUM_LEDS];
@@ -23,12 +24,44 @@ CRGB leds[NUM_LEDS];
 bool wifiConnected = false;
 unsigned long lastPacketTime = 0;
 const unsigned long timeoutMs = 5000; // 5 second timeout
+bool framePending = false; // A frame flagged FLAG_LATCH waits for OP_SHOW
 
 // Packet structure: [strip_id][brightness][R][G][B][R][G][B]...
 // strip_id: 1 byte (0-2)
 // brightness: 1 byte (0-255)
 // LED data: 3 bytes per LED (RGB)
 
+// Extended packets start with an opcode >= 0x80, which is never a strip_id
+// Chunked frame (fits in one MTU, so large strips avoid IP fragmentation):
+// [OP_PIXELS][strip_id][brightness][flags][frame hi][frame lo][offset hi][offset lo][count hi][count lo][R][G][B]...
+// Fill (whole strip one color, ends the frame):
+// [OP_FILL][strip_id][brightness][flags][frame hi][frame lo][R][G][B]
+// Delta (changed ranges, applied on top of the current pixels):
+// [OP_DELTA][strip_id][brightness][flags][frame hi][frame lo] then per range [offset hi][offset lo][count hi][count lo][R][G][B]...
+// Coded (whole frame in one packet, ends the frame):
+// [OP_CODED][strip_id][brightness][flags][frame hi][frame lo][codec][count hi][count lo] then per codec
+//   CODEC_RAW: [R][G][B]... x count
+//   CODEC_RLE: runs of [length 1-255][R][G][B]
+//   CODEC_PALETTE: [palette size, 0 = 256][R][G][B] x palette size, then [index] x count
+// Show (two-phase latch, sent once every strip has its data, usually as a broadcast):
+// [OP_SHOW][strip_id or 0xFF for all][0][0][show hi][show lo]
+#define OP_PIXELS 0xA1
+#define OP_FILL 0xA2
+#define OP_DELTA 0xA3
+#define OP_CODED 0xA4
+#define OP_SHOW 0xA5
+#define SHOW_ALL_STRIPS 0xFF
+#define CODEC_RAW 0
+#define CODEC_RLE 1
+#define CODEC_PALETTE 2
+#define FLAG_SHOW 0x01   // Last packet of the frame: show it now
+#define FLAG_LATCH 0x02  // Last packet of the frame: hold it until OP_SHOW
+#define FRAME_HEADER_SIZE 6
+#define CHUNK_HEADER_SIZE 10
+#define FILL_PACKET_SIZE 9
+#define RANGE_HEADER_SIZE 4
+#define CODED_HEADER_SIZE 9
+
 void setup() {
   Serial.begin(115200);
   Serial.println("ESP32 LED Receiver Starting...");
@@ -89,6 +122,7 @@ void setupWiFi() {
   Serial.println(ssid);
   
   WiFi.begin(ssid, password);
+  WiFi.setSleep(false); // Modem sleep delays broadcast packets such as OP_SHOW to the next DTIM beacon
   
   int attempts = 0;
   while (WiFi.status() != WL_CONNECTED && attempts < 20) {
@@ -119,6 +153,27 @@ void handleIncomingPacket() {
     return;
   }
   
+  if (packetBuffer[0] == OP_PIXELS) {
+    handlePixelChunk(packetBuffer, len);
+    return;
+  }
+  if (packetBuffer[0] == OP_FILL) {
+    handlePixelFill(packetBuffer, len);
+    return;
+  }
+  if (packetBuffer[0] == OP_DELTA) {
+    handlePixelDelta(packetBuffer, len);
+    return;
+  }
+  if (packetBuffer[0] == OP_CODED) {
+    handleCodedFrame(packetBuffer, len);
+    return;
+  }
+  if (packetBuffer[0] == OP_SHOW) {
+    handleShow(packetBuffer, len);
+    return;
+  }
+  
   // Extract packet data
   uint8_t stripId = packetBuffer[0];
   uint8_t brightness = packetBuffer[1];
@@ -162,6 +217,203 @@ void handleIncomingPacket() {
   // Serial.println(brightness);
 }
 
+void handlePixelChunk(uint8_t* packet, int len) {
+  if (len < CHUNK_HEADER_SIZE) {
+    Serial.println("Chunk too short");
+    return;
+  }
+  
+  // Check if this chunk is for this ESP32
+  if (packet[1] != STRIP_ID) {
+    return;
+  }
+  
+  uint8_t brightness = packet[2];
+  uint8_t flags = packet[3];
+  uint16_t offset = (packet[6] << 8) | packet[7];
+  uint16_t count = (packet[8] << 8) | packet[9];
+  
+  if (offset + count > NUM_LEDS || len - CHUNK_HEADER_SIZE < count * 3) {
+    Serial.println("Invalid chunk");
+    return;
+  }
+  
+  FastLED.setBrightness(brightness);
+  
+  // Update this chunk's LED colors
+  const uint8_t* rgb = packet + CHUNK_HEADER_SIZE;
+  for (int i = 0; i < count; i++) {
+    leds[offset + i] = CRGB(rgb[i * 3], rgb[i * 3 + 1], rgb[i * 3 + 2]);
+  }
+  
+  // Latch on the last chunk; pixels from lost chunks keep the previous frame's colors
+  if (flags & (FLAG_SHOW | FLAG_LATCH)) {
+    endFrame(flags);
+    
+    // Debug output (uncomment for debugging)
+    // Serial.print("Completed frame ");
+    // Serial.println((packet[4] << 8) | packet[5]);
+  }
+}
+
+void handlePixelFill(uint8_t* packet, int len) {
+  if (len < FILL_PACKET_SIZE) {
+    Serial.println("Fill too short");
+    return;
+  }
+  
+  // Check if this fill is for this ESP32
+  if (packet[1] != STRIP_ID) {
+    return;
+  }
+  
+  FastLED.setBrightness(packet[2]);
+  fill_solid(leds, NUM_LEDS, CRGB(packet[6], packet[7], packet[8]));
+  endFrame(packet[3]);
+}
+
+void handlePixelDelta(uint8_t* packet, int len) {
+  if (len < FRAME_HEADER_SIZE) {
+    Serial.println("Delta too short");
+    return;
+  }
+  
+  // Check if this delta is for this ESP32
+  if (packet[1] != STRIP_ID) {
+    return;
+  }
+  
+  FastLED.setBrightness(packet[2]);
+  uint8_t flags = packet[3];
+  
+  // Apply each changed range on top of the current colors
+  int pos = FRAME_HEADER_SIZE;
+  while (pos + RANGE_HEADER_SIZE <= len) {
+    uint16_t offset = (packet[pos] << 8) | packet[pos + 1];
+    uint16_t count = (packet[pos + 2] << 8) | packet[pos + 3];
+    pos += RANGE_HEADER_SIZE;
+    
+    if (offset + count > NUM_LEDS || pos + count * 3 > len) {
+      Serial.println("Invalid delta range");
+      return;
+    }
+    
+    for (int i = 0; i < count; i++) {
+      leds[offset + i] = CRGB(packet[pos], packet[pos + 1], packet[pos + 2]);
+      pos += 3;
+    }
+  }
+  
+  if (flags & (FLAG_SHOW | FLAG_LATCH)) {
+    endFrame(flags);
+  }
+}
+
+void handleCodedFrame(uint8_t* packet, int len) {
+  if (len < CODED_HEADER_SIZE) {
+    Serial.println("Coded frame too short");
+    return;
+  }
+  
+  // Check if this frame is for this ESP32
+  if (packet[1] != STRIP_ID) {
+    return;
+  }
+  
+  uint8_t brightness = packet[2];
+  uint8_t codec = packet[6];
+  uint16_t count = (packet[7] << 8) | packet[8];
+  const uint8_t* payload = packet + CODED_HEADER_SIZE;
+  int payloadLength = len - CODED_HEADER_SIZE;
+  
+  if (count > NUM_LEDS) {
+    Serial.println("Coded frame larger than strip");
+    return;
+  }
+  
+  if (codec == CODEC_RAW) {
+    if (payloadLength < count * 3) {
+      Serial.println("Incomplete raw frame");
+      return;
+    }
+    for (int i = 0; i < count; i++) {
+      leds[i] = CRGB(payload[i * 3], payload[i * 3 + 1], payload[i * 3 + 2]);
+    }
+  } else if (codec == CODEC_RLE) {
+    // Runs must add up to exactly count pixels; check them all before touching the strip
+    int pixel = 0;
+    int runsLength = 0;
+    while (pixel < count && runsLength + 4 <= payloadLength) {
+      uint8_t run = payload[runsLength];
+      if (run == 0 || pixel + run > count) {
+        break;
+      }
+      pixel += run;
+      runsLength += 4;
+    }
+    if (pixel != count) {
+      Serial.println("Invalid RLE frame");
+      return;
+    }
+    pixel = 0;
+    for (int pos = 0; pos < runsLength; pos += 4) {
+      fill_solid(leds + pixel, payload[pos], CRGB(payload[pos + 1], payload[pos + 2], payload[pos + 3]));
+      pixel += payload[pos];
+    }
+  } else if (codec == CODEC_PALETTE) {
+    int paletteSize = payloadLength > 0 && payload[0] > 0 ? payload[0] : 256;
+    int indexStart = 1 + paletteSize * 3;
+    if (payloadLength < indexStart + count) {
+      Serial.println("Incomplete palette frame");
+      return;
+    }
+    // Check every index before writing, so a bad frame leaves the strip untouched
+    for (int i = 0; i < count; i++) {
+      if (payload[indexStart + i] >= paletteSize) {
+        Serial.println("Invalid palette index");
+        return;
+      }
+    }
+    for (int i = 0; i < count; i++) {
+      const uint8_t* color = payload + 1 + payload[indexStart + i] * 3;
+      leds[i] = CRGB(color[0], color[1], color[2]);
+    }
+  } else {
+    Serial.println("Unknown codec");
+    return;
+  }
+  
+  FastLED.setBrightness(brightness);
+  endFrame(packet[3]);
+}
+
+// Show a completed frame now, or hold it for OP_SHOW so every strip latches at the same moment
+void endFrame(uint8_t flags) {
+  if (flags & FLAG_LATCH) {
+    framePending = true;
+  } else {
+    FastLED.show();
+  }
+}
+
+void handleShow(uint8_t* packet, int len) {
+  if (len < FRAME_HEADER_SIZE) {
+    Serial.println("Show too short");
+    return;
+  }
+  
+  // Check if this show is for this ESP32
+  if (packet[1] != STRIP_ID && packet[1] != SHOW_ALL_STRIPS) {
+    return;
+  }
+  
+  // Nothing held, e.g. the frame did not change or its data was lost
+  if (framePending) {
+    FastLED.show();
+    framePending = false;
+  }
+}
+
 // Optional: Add status LED to show connection state
 void updateStatusLED() {
   // This could be used to show WiFi connection status
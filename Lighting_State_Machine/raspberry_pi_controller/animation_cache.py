@@ -0,0 +1,97 @@
+"""
+Periodic animation cache for the LED controller
+Deterministic modes whose frames repeat with a cycling counter (hue, aurora_phase) keep one
+full period per strip length in a contiguous array, filled as the frames are first rendered and then served
+by index, within a memory budget shared by every mode and strip length with least-recently-used eviction
+"""
+
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+import numpy as np
+
+class CacheEntry:
+    """One period of frames for a mode, strip length and phase offset"""
+
+    def __init__(self, period: int, led_count: int):
+        self.frames = np.empty((period, led_count, 3), dtype=np.uint8)
+        self.filled = np.zeros(period, dtype=bool)
+
+    @property
+    def nbytes(self) -> int:
+        return self.frames.nbytes
+
+class AnimationCache:
+    """LRU cache of periodic animation frames within a memory budget"""
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()  # Least recently used first
+        self.refused = set()  # Keys whose period alone exceeds the budget
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, led_count: int, period: int, index: int,
+            render: Callable[[int, np.ndarray], object]) -> Optional[np.ndarray]:
+        """Frame index of the period cached under key, rendered into the cache by render(index, out) on first use
+
+        Returns None when one period of this strip length does not fit in the budget;
+        the caller then renders the frame itself.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            if key in self.refused:
+                return None
+            entry = self._add(key, period, led_count)
+            if entry is None:
+                return None
+        else:
+            self.entries.move_to_end(key)
+
+        if not entry.filled[index]:
+            render(index, entry.frames[index])
+            entry.filled[index] = True
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry.frames[index]
+
+    def _add(self, key: Hashable, period: int, led_count: int) -> Optional[CacheEntry]:
+        size = period * led_count * 3
+        if size > self.budget_bytes:
+            self.refused.add(key)
+            return None
+        while self.entries and self.bytes + size > self.budget_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+        entry = CacheEntry(period, led_count)
+        self.entries[key] = entry
+        self.bytes += entry.nbytes
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+        self.refused.clear()
+        self.bytes = 0
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'refused': len(self.refused),
+        }
+
+    def format_stats(self) -> str:
+        """Get a one-line summary of the cache statistics"""
+        stats = self.get_stats()
+        return (f"Animation cache: {stats['entries']} periods, {stats['bytes'] / 2**20:.1f}/"
+                f"{stats['budget_bytes'] / 2**20:.0f} MiB, hit rate {stats['hit_rate'] * 100:.1f}%, "
+                f"{stats['evictions']} evictions, {stats['refused']} over budget")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Renderer benchmark for the LED controller
+Times calculate_led_data for every LED mode, with music mode off and on, across strip lengths,
+and reports latency percentiles, per-frame allocation peaks, retained blocks and maximum sustainable frame rate as JSON
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import socket
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+from led_controller import LEDController, LEDModes, SAMPLE_RATE, CHUNK_SIZE
+from input_backends import NullEncoder, NullAudioSource, SyntheticAudioSource
+
+DEFAULT_STRIP_LENGTHS = [5, 50, 100, 500, 1000, 5000, 10000]
+DEFAULT_FRAMES = 200
+WARMUP_FRAMES = 20
+ALLOCATION_FRAMES = 20
+NUM_STRIPS = 3
+# Snapshots and the benchmark's own bookkeeping are allocated while tracing; leave them out of the retained blocks
+SNAPSHOT_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+
+def mode_names() -> dict:
+    """Map LEDModes values to their names"""
+    return {value: name for name, value in vars(LEDModes).items() if name.isupper()}
+
+def create_controller(strip_length: int, sink_port: int, workers: int = 0) -> LEDController:
+    """Build a headless controller that renders every frame and sends its packets to a local sink socket"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        controller = LEDController(encoder=NullEncoder(), audio_source=NullAudioSource(SAMPLE_RATE),
+                                   esp32_ips=["127.0.0.1"] * NUM_STRIPS,
+                                   num_leds_per_strip=[strip_length] * NUM_STRIPS,
+                                   render_workers=workers, static_frames=False)
+    controller.destinations = [("127.0.0.1", sink_port)] * NUM_STRIPS
+    return controller
+
+class AudioFeed:
+    """Publishes a fresh analysis of a synthetic signal before each music-mode frame"""
+
+    def __init__(self, controller: LEDController):
+        self.processor = controller.audio_processor
+        self.source = SyntheticAudioSource(SAMPLE_RATE, CHUNK_SIZE, realtime=False, seed=0)
+
+    def next_chunk(self):
+        self.processor.analyze_frequency_bands(self.source.read_chunk())
+
+def render_frame(controller: LEDController, send: bool):
+    """One frame of run_animation_loop without the encoder or the scheduler"""
+    for strip_index, led_data in enumerate(controller.render_frame()):
+        if send:
+            controller.send_data_to_esp32(strip_index, led_data)
+    if send:
+        controller.flush_frame()
+    controller.update_animation_state()
+
+def run_case(mode: int, strip_length: int, music: bool, frames: int, send: bool, sink_port: int,
+             workers: int = 0) -> dict:
+    """Benchmark one mode / strip length / music combination"""
+    controller = create_controller(strip_length, sink_port, workers)
+    controller.state.current_mode = mode
+    controller.music_mode_enabled = music
+    audio = AudioFeed(controller) if music else None
+
+    for _ in range(WARMUP_FRAMES):
+        if audio:
+            audio.next_chunk()
+        render_frame(controller, send)
+
+    # Timed pass
+    times = np.empty(frames)
+    for frame in range(frames):
+        if audio:
+            audio.next_chunk()
+        start = time.perf_counter_ns()
+        render_frame(controller, send)
+        times[frame] = time.perf_counter_ns() - start
+    times_ms = times / 1e6
+
+    # Separate traced pass, since tracemalloc slows rendering down: the peak of each frame's
+    # allocations, and the blocks a frame leaves allocated (temporaries freed within it are not counted)
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    for _ in range(ALLOCATION_FRAMES):
+        if audio:
+            audio.next_chunk()
+        before = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        render_frame(controller, send)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        after = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        retained.append(sum(max(0, stat.count_diff) for stat in after.compare_to(before, 'lineno')))
+    tracemalloc.stop()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        controller.stop()
+
+    p50, p90, p99 = np.percentile(times_ms, [50, 90, 99])
+    return {
+        'mode': mode_names().get(mode, str(mode)),
+        'mode_id': mode,
+        'strip_length': strip_length,
+        'strips': NUM_STRIPS,
+        'music': music,
+        'workers': workers,
+        'frames': frames,
+        'mean_ms': float(times_ms.mean()),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'max_ms': float(times_ms.max()),
+        'alloc_peak_bytes': int(np.median(peaks)),
+        'retained_blocks': int(np.median(retained)),
+        'max_fps': float(1000.0 / p99) if p99 > 0 else float('inf'),
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results: list, baseline_path: str):
+    """Print the p50 change of every case against a previous JSON report"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['mode_id'], r['strip_length'], r['music']): r for r in baseline['results']}
+    print(f"\nComparison with {baseline_path} ({baseline.get('revision', 'unknown')}):")
+    for result in results:
+        old = previous.get((result['mode_id'], result['strip_length'], result['music']))
+        if old and old['p50_ms'] > 0:
+            change = (result['p50_ms'] / old['p50_ms'] - 1) * 100
+            print(f"  {result['mode']:<14} {result['strip_length']:>6} music={'on ' if result['music'] else 'off'} "
+                  f"p50 {old['p50_ms']:8.3f} -> {result['p50_ms']:8.3f} ms ({change:+6.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LED frame rendering")
+    parser.add_argument("--lengths", type=int, nargs="+", default=DEFAULT_STRIP_LENGTHS,
+                        help="Strip lengths to benchmark (three strips of each length)")
+    parser.add_argument("--modes", type=int, nargs="+", default=sorted(mode_names()),
+                        help="LEDModes values to benchmark (default: all)")
+    parser.add_argument("--music", choices=("off", "on", "both"), default="both", help="Music mode states")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="Timed frames per case")
+    parser.add_argument("--send", action="store_true", help="Include building and sending packets to a local socket")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Render in this many worker processes (see render_workers.py)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare p50 latencies against a previous JSON report")
+    args = parser.parse_args()
+
+    music_states = {"off": [False], "on": [True], "both": [False, True]}[args.music]
+
+    # Packets are sent to a bound socket that is never read; the kernel drops what does not fit
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    sink_port = sink.getsockname()[1]
+
+    results = []
+    print(f"{'mode':<14} {'leds':>6} {'music':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'peak KiB':>9} {'retained blocks':>15} {'max FPS':>9}")
+    for strip_length in args.lengths:
+        for mode in args.modes:
+            for music in music_states:
+                result = run_case(mode, strip_length, music, args.frames, args.send, sink_port, args.workers)
+                results.append(result)
+                print(f"{result['mode']:<14} {strip_length:>6} {'on' if music else 'off':>5} "
+                      f"{result['p50_ms']:8.3f} {result['p99_ms']:8.3f} {result['max_ms']:8.3f} "
+                      f"{result['alloc_peak_bytes'] / 1024:9.1f} {result['retained_blocks']:15d} {result['max_fps']:9.1f}")
+    sink.close()
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'send': args.send,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Color space helpers for the LED controller
+Scalar and vectorized HSV to RGB conversion plus a prebuilt hue x value lookup table
+"""
+
+from typing import Tuple
+import numpy as np
+
+# Lookup table dimensions: integer hues (degrees) x 8-bit values
+LUT_HUES = 360
+LUT_VALUES = 256
+
+def hsv_to_rgb(h: float, s: float, v: float) -> Tuple[int, int, int]:
+    """Convert HSV to RGB"""
+    h = h % 360
+    c = v * s
+    x = c * (1 - abs((h / 60) % 2 - 1))
+    m = v - c
+
+    if 0 <= h < 60:
+        r, g, b = c, x, 0
+    elif 60 <= h < 120:
+        r, g, b = x, c, 0
+    elif 120 <= h < 180:
+        r, g, b = 0, c, x
+    elif 180 <= h < 240:
+        r, g, b = 0, x, c
+    elif 240 <= h < 300:
+        r, g, b = x, 0, c
+    else:
+        r, g, b = c, 0, x
+
+    return (int((r + m) * 255), int((g + m) * 255), int((b + m) * 255))
+
+def hsv_to_rgb_array(h, s, v, out: np.ndarray = None) -> np.ndarray:
+    """Convert arrays of HSV values to an (n, 3) uint8 RGB array, matching hsv_to_rgb"""
+    h, s, v = np.broadcast_arrays(np.mod(h, 360), s, v)
+    c = v * s
+    x = c * (1 - np.abs((h / 60) % 2 - 1))
+    m = v - c
+    zero = np.zeros_like(c)
+
+    sectors = [h < 60, h < 120, h < 180, h < 240, h < 300]
+    r = np.select(sectors, [c, x, zero, zero, x], c)
+    g = np.select(sectors, [x, c, c, x, zero], zero)
+    b = np.select(sectors, [zero, zero, x, c, c], x)
+
+    if out is None:
+        out = np.empty((h.size, 3), dtype=np.uint8)
+    out[:, 0] = (r + m) * 255
+    out[:, 1] = (g + m) * 255
+    out[:, 2] = (b + m) * 255
+    return out
+
+def _build_hue_value_lut() -> np.ndarray:
+    """Full-saturation colors for every integer hue and value/255, flattened to (hue * 256 + value, 3)"""
+    hues, values = np.meshgrid(np.arange(LUT_HUES), np.arange(LUT_VALUES), indexing='ij')
+    return hsv_to_rgb_array(hues.ravel(), 1.0, values.ravel() / 255.0)
+
+HUE_VALUE_LUT = _build_hue_value_lut()
+
+def hsv_lut(hue, value, out: np.ndarray = None) -> np.ndarray:
+    """Look up hsv_to_rgb(hue, 1.0, value / 255) for integer hues and 8-bit values
+
+    Hues wrap modulo 360. Scalar arguments return a single (3,) color,
+    array arguments an (n, 3) uint8 array (written into out when given).
+    """
+    index = np.mod(hue, LUT_HUES) * LUT_VALUES + value
+    return np.take(HUE_VALUE_LUT, index, axis=0, out=out)
@@ -0,0 +1,183 @@
+"""
+Effect engines for the LED controller
+Stateful, vectorized simulations for the random modes (fire, aurora, twinkle); each engine renders one strip,
+draws all of a frame's random numbers in one batch from a NumPy Generator and works in preallocated buffers
+"""
+
+import numpy as np
+from color import hsv_lut
+
+def _build_fire_palette() -> np.ndarray:
+    """Heat (0-255) to RGB: red up to 85, then green up to 170, then blue"""
+    heat = np.arange(256)
+    palette = np.empty((256, 3), dtype=np.uint8)
+    for channel, start in enumerate((0, 85, 170)):
+        palette[:, channel] = np.clip((heat - start) * 3, 0, 255)
+    return palette
+
+FIRE_PALETTE = _build_fire_palette()
+
+class FireEngine:
+    """Fire simulation for one strip: cooling, 3-tap heat diffusion, sparkles and sparks"""
+
+    COOLING = 3            # Cells cool by 0-2 per frame
+    SPARKLE_CHANCE = 50    # Out of 256, per cell and frame
+    SPARKLE_HEAT = 11      # Sparkles add 0-10
+    SPARK_CHANCE = 120     # Out of 256, per frame
+    SPARK_HEAT = (160, 256)  # A spark adds 160-255 to one cell
+
+    def __init__(self, led_count: int, rng: np.random.Generator = None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.heat = np.zeros(led_count, dtype=np.uint8)
+        self.padded = np.zeros(led_count + 2, dtype=np.int16)  # Ends stay 0, the heat beyond the strip
+        self.diffused = np.zeros(led_count, dtype=np.int16)
+        self.noise = np.empty((3, led_count), dtype=np.float32)
+        self.draws = np.empty((3, led_count), dtype=np.int16)
+        self.sparkles = np.empty(led_count, dtype=bool)
+        self.palette_index = np.empty(led_count, dtype=np.intp)  # np.take would otherwise convert into a new array
+        # Rows of the batch: cooling, sparkle roll, sparkle heat
+        self.draw_ranges = np.array([[self.COOLING], [256], [self.SPARKLE_HEAT]], dtype=np.float32)
+
+    def step(self, out: np.ndarray) -> np.ndarray:
+        """Advance one frame and write the colors into out, an (n_leds, 3) uint8 array"""
+        led_count = len(self.heat)
+        if led_count == 0:
+            return out
+
+        # Every per-cell random integer for the frame, from one batch of uniform floats
+        self.rng.random(dtype=np.float32, out=self.noise)
+        np.multiply(self.noise, self.draw_ranges, out=self.noise)
+        np.copyto(self.draws, self.noise, casting='unsafe')
+        cooling, sparkle_rolls, sparkle_heat = self.draws
+
+        # Cool down every cell
+        cooled = self.padded[1:-1]
+        np.subtract(self.heat, cooling, out=cooled)
+        np.maximum(cooled, 0, out=cooled)
+
+        # Heat diffusion: average of each cell and its neighbours as shifted slices
+        heat = self.diffused
+        np.add(self.padded[:-2], cooled, out=heat)
+        np.add(heat, self.padded[2:], out=heat)
+        np.floor_divide(heat, 3, out=heat)
+
+        # Sparkles add a little heat to random cells
+        np.less(sparkle_rolls, self.SPARKLE_CHANCE, out=self.sparkles)
+        np.multiply(sparkle_heat, self.sparkles, out=sparkle_heat)
+        np.add(heat, sparkle_heat, out=heat)
+        np.minimum(heat, 255, out=heat)
+
+        # Occasionally a spark flares up
+        if self.rng.integers(256) < self.SPARK_CHANCE:
+            position = self.rng.integers(led_count)
+            heat[position] = min(255, heat[position] + self.rng.integers(*self.SPARK_HEAT))
+
+        np.copyto(self.heat, heat, casting='unsafe')
+        np.copyto(self.palette_index, heat)
+        return np.take(FIRE_PALETTE, self.palette_index, axis=0, out=out, mode='clip')
+
+def _build_aurora_palette() -> np.ndarray:
+    """Wave intensity (0-255) to the blend of green, purple and pink it selects"""
+    colors = np.array([(96, 200, 120), (192, 100, 200), (224, 100, 150)])
+    position = np.arange(256) / 255.0 * (len(colors) - 1)
+    index = position.astype(np.int32)
+    blend = (position - index)[:, np.newaxis]
+    low = colors[index]
+    high = colors[np.minimum(index + 1, len(colors) - 1)]
+    return (low + (high - low) * blend).astype(np.uint8)
+
+AURORA_PALETTE = _build_aurora_palette()
+
+class AuroraEngine:
+    """Aurora for one strip: three travelling sine waves pick a palette color, plus per-channel noise"""
+
+    WAVES = ((1.0, 2), (0.6, 3), (0.3, 1))  # (phase speed, LED spacing) of each wave, in steps of pi/128
+    WAVE_WEIGHTS = np.array([[2], [1], [1]], dtype=np.int16)  # The first wave dominates the average of 4
+    VARIATION = 12  # Channels vary by up to +-12
+
+    def __init__(self, led_count: int, rng: np.random.Generator = None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.intensity = np.zeros(led_count, dtype=np.uint8)
+        scale = np.pi / 128
+        indices = np.arange(led_count, dtype=np.float32)
+        # Phase vectors: each wave's angle along the strip, to which only the frame's phase is added
+        self.offsets = np.stack([indices * (spacing * scale) for _, spacing in self.WAVES]).astype(np.float32)
+        self.speeds = np.array([[speed * scale] for speed, _ in self.WAVES], dtype=np.float32)
+        self.phase_angles = np.empty((len(self.WAVES), 1), dtype=np.float32)
+        self.angles = np.empty((len(self.WAVES), led_count), dtype=np.float32)
+        self.waves = np.empty((len(self.WAVES), led_count), dtype=np.int16)
+        self.combined = np.empty(led_count, dtype=np.intp)
+        self.noise = np.empty((led_count, 3), dtype=np.float32)
+        self.colors = np.empty((led_count, 3), dtype=np.int16)
+
+    def render_base(self, phase: int, out: np.ndarray) -> np.ndarray:
+        """Palette colors for a phase, before the random variation; depends on nothing else"""
+        # Wave value = 127 * (1 + sin(angle)), truncated like the integer waves
+        np.multiply(self.speeds, phase, out=self.phase_angles)
+        np.add(self.offsets, self.phase_angles, out=self.angles)
+        np.sin(self.angles, out=self.angles)
+        np.add(self.angles, 1, out=self.angles)
+        np.multiply(self.angles, 127, out=self.angles)
+        np.copyto(self.waves, self.angles, casting='unsafe')
+
+        np.multiply(self.waves, self.WAVE_WEIGHTS, out=self.waves)
+        np.sum(self.waves, axis=0, out=self.combined)
+        np.floor_divide(self.combined, 4, out=self.combined)
+        np.copyto(self.intensity, self.combined, casting='unsafe')
+        return np.take(AURORA_PALETTE, self.combined, axis=0, out=out, mode='clip')
+
+    def add_variation(self, base: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Add one batch of uniform noise to the base colors, clipped into out"""
+        self.rng.random(dtype=np.float32, out=self.noise)
+        np.multiply(self.noise, 2 * self.VARIATION + 1, out=self.noise)
+        np.copyto(self.colors, self.noise, casting='unsafe')
+        np.add(self.colors, base, out=self.colors, casting='unsafe')
+        np.subtract(self.colors, self.VARIATION, out=self.colors)
+        return np.clip(self.colors, 0, 255, out=out, casting='unsafe')
+
+# Twinkle colors by index: fading gray levels 0-255, then the full-brightness color of each hue 0-360
+TWINKLE_HUES = 361
+TWINKLE_PALETTE = np.concatenate((np.repeat(np.arange(256, dtype=np.uint8)[:, np.newaxis], 3, axis=1),
+                                  hsv_lut(np.arange(TWINKLE_HUES), 255)))
+
+class TwinkleEngine:
+    """Twinkle for one strip: random LEDs light up in a random hue, then fade out in white"""
+
+    TRIGGER_CHANCE = 20  # Out of 256, per LED and frame
+    FADE = 20            # Twinkle level lost per frame
+
+    def __init__(self, led_count: int, rng: np.random.Generator = None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.state = self.rng.integers(0, 256, led_count, dtype=np.uint8)
+        self.noise = np.empty((3, led_count), dtype=np.float32)
+        self.draws = np.empty((3, led_count), dtype=np.int16)
+        self.draw_ranges = np.array([[256], [256], [TWINKLE_HUES]], dtype=np.float32)  # Trigger roll, level, hue
+        self.triggered = np.empty(led_count, dtype=bool)
+        self.faded = np.empty(led_count, dtype=np.uint8)
+        self.palette_index = np.empty(led_count, dtype=np.intp)
+
+    def step(self, out: np.ndarray) -> np.ndarray:
+        """Advance one frame and write the colors into out, an (n_leds, 3) uint8 array"""
+        self.rng.random(dtype=np.float32, out=self.noise)
+        np.multiply(self.noise, self.draw_ranges, out=self.noise)
+        np.copyto(self.draws, self.noise, casting='unsafe')
+        rolls, levels, hues = self.draws
+        np.less(rolls, self.TRIGGER_CHANCE, out=self.triggered)
+
+        # Every twinkle fades, floored at 0; unlit LEDs stay at 0
+        np.maximum(self.state, self.FADE, out=self.faded)
+        np.subtract(self.faded, self.FADE, out=self.faded)
+
+        # Triggered LEDs restart at a random level: faded + triggered * (level - faded), without branching
+        np.subtract(levels, self.faded, out=levels)
+        np.multiply(levels, self.triggered, out=levels)
+        np.add(levels, self.faded, out=levels)
+        np.copyto(self.state, levels, casting='unsafe')
+
+        # Palette index: the hue's color when triggered, else the faded gray level
+        index = self.palette_index
+        np.add(hues, 256, out=index)
+        np.subtract(index, self.faded, out=index)
+        np.multiply(index, self.triggered, out=index)
+        np.add(index, self.faded, out=index)
+        return np.take(TWINKLE_PALETTE, index, axis=0, out=out, mode='clip')
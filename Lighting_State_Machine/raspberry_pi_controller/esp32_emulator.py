@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+ESP32 receiver emulator
+Listens for LED packets like esp32_led_receiver.ino (legacy, chunked, fill, delta, coded and show latch) and
+reports per-strip frame counts, inter-arrival jitter, malformed packets, dropped frames and the skew between
+the moments the strips show the same frame, without any hardware
+"""
+
+import argparse
+import json
+import socket
+import statistics
+import time
+from collections import deque
+from typing import Dict, Optional
+import numpy as np
+from led_protocol import (OP_PIXELS, OP_FILL, OP_DELTA, OP_CODED, OP_SHOW, FLAG_SHOW, FLAG_LATCH, SHOW_ALL_STRIPS, CHUNK_HEADER_SIZE, FRAME_HEADER_SIZE,
+                          FILL_PACKET_SIZE, RANGE_HEADER, RANGE_HEADER_SIZE, MAX_DATAGRAM_PAYLOAD,
+                          CODEC_NAMES, parse_chunk_header, parse_frame_header, decode_coded_frame, is_extended)
+
+UDP_PORT = 8888
+NUM_LEDS = 1000  # Matches NUM_LEDS in esp32_led_receiver.ino
+
+# WS2812 timing: 24 bits at 800 kHz per LED plus the latch/reset gap
+LED_WRITE_US = 30.0
+RESET_US = 50.0
+LOOP_DELAY_US = 1000.0   # delay(1) at the end of loop()
+RX_QUEUE_PACKETS = 6     # lwIP UDP receive mailbox size on the ESP32
+
+class BoardStats:
+    """Packet and frame counters for one emulated board"""
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.frames_shown = 0
+        self.short_packets = 0       # Fewer than 3 bytes ("Packet too short")
+        self.incomplete_packets = 0  # Fewer than NUM_LEDS pixels ("Incomplete LED data")
+        self.oversize_packets = 0    # Longer than the receive buffer, truncated by udp.read
+        self.rx_overflows = 0        # Arrived while the board's receive queue was full
+        self.gap_frames = 0          # Frames missing according to the expected frame interval
+        self.chunks = 0              # OP_PIXELS datagrams
+        self.invalid_chunks = 0      # OP_PIXELS datagrams with a bad offset/count or short payload
+        self.partial_frames = 0      # Chunked frames shown with some chunks missing
+        self.dropped_frames = 0      # Extended frames never shown, from gaps in the frame numbers
+        self.fills = 0               # OP_FILL datagrams
+        self.deltas = 0              # OP_DELTA datagrams
+        self.invalid_deltas = 0      # OP_DELTA datagrams with a range outside the strip or the payload
+        self.coded = dict.fromkeys(CODEC_NAMES.values(), 0)  # OP_CODED datagrams per codec
+        self.invalid_coded = 0       # OP_CODED datagrams that fail to decode or exceed the strip
+        self.shows = 0               # OP_SHOW messages
+        self.empty_shows = 0         # OP_SHOW messages with no frame held, e.g. unchanged delta frames
+        self.first_arrival = None
+        self.last_arrival = None
+        self.last_frame_arrival = None
+        self.intervals = deque(maxlen=1000)  # Between frame-ending packets
+
+    def to_dict(self, expected_interval: Optional[float]) -> dict:
+        span = (self.last_arrival - self.first_arrival) if self.packets > 1 else 0.0
+        intervals_ms = [i * 1000 for i in self.intervals]
+        result = {
+            'packets': self.packets,
+            'frames_shown': self.frames_shown,
+            'bytes': self.bytes,
+            'packet_rate': (self.packets - 1) / span if span > 0 else 0.0,
+            'mbit_per_s': self.bytes * 8 / span / 1e6 if span > 0 else 0.0,
+            'interval_mean_ms': statistics.fmean(intervals_ms) if intervals_ms else 0.0,
+            'jitter_ms': statistics.pstdev(intervals_ms) if len(intervals_ms) > 1 else 0.0,
+            'interval_max_ms': max(intervals_ms) if intervals_ms else 0.0,
+            'short_packets': self.short_packets,
+            'incomplete_packets': self.incomplete_packets,
+            'oversize_packets': self.oversize_packets,
+            'rx_overflows': self.rx_overflows,
+        }
+        coded = sum(self.coded.values())
+        if self.chunks or self.fills or self.deltas or coded:
+            result.update({
+                'chunks': self.chunks,
+                'invalid_chunks': self.invalid_chunks,
+                'partial_frames': self.partial_frames,
+                'dropped_frames': self.dropped_frames,
+            })
+        if self.fills or self.deltas:
+            result.update({
+                'fills': self.fills,
+                'deltas': self.deltas,
+                'invalid_deltas': self.invalid_deltas,
+            })
+        if coded or self.invalid_coded:
+            result.update({
+                'coded': dict(self.coded),
+                'invalid_coded': self.invalid_coded,
+            })
+        if self.shows:
+            result.update({
+                'shows': self.shows,
+                'empty_shows': self.empty_shows,
+            })
+        if expected_interval:
+            result['gap_frames'] = self.gap_frames
+        return result
+
+class EmulatedBoard:
+    """One ESP32 running esp32_led_receiver.ino"""
+
+    def __init__(self, strip_id: int, num_leds: int, model_show: bool, led_write_us: float = LED_WRITE_US,
+                 rx_queue_packets: int = RX_QUEUE_PACKETS):
+        self.strip_id = strip_id
+        self.num_leds = num_leds
+        self.packet_size = max(3 + num_leds * 3, MAX_DATAGRAM_PAYLOAD)  # Receive buffer size in the sketch
+        self.leds = np.zeros((num_leds, 3), dtype=np.uint8)
+        self.brightness = 255
+        self.stats = BoardStats()
+        
+        # Extended framing state
+        self.chunk_frame = None       # Frame number being assembled
+        self.chunk_pixels = 0         # Pixels received for it so far
+        self.last_shown_frame = None  # Frame number of the last frame completed
+        self.latch_pending = False    # A FLAG_LATCH frame is held until OP_SHOW
+        
+        # When each frame was shown, keyed ("show", show number) for latched frames and
+        # ("frame", index) otherwise, so the same frame can be matched across boards
+        self.show_key = None
+        self.show_log = deque(maxlen=1000)
+
+        # Optional model of the board being busy in FastLED.show()
+        self.model_show = model_show
+        self.show_time = (num_leds * led_write_us + RESET_US) / 1e6
+        self.loop_time = LOOP_DELAY_US / 1e6
+        self.rx_queue = deque()
+        self.rx_queue_packets = rx_queue_packets
+        self.busy_until = 0.0
+
+    def receive(self, data: bytes, arrival: float, expected_interval: Optional[float]):
+        """Account for an arriving packet and process it, or queue it while the board is busy"""
+        stats = self.stats
+        if stats.first_arrival is None:
+            stats.first_arrival = arrival
+        stats.last_arrival = arrival
+        
+        # Frame timing is measured between the packets that end a frame
+        if is_frame_end(data):
+            if stats.last_frame_arrival is not None:
+                interval = arrival - stats.last_frame_arrival
+                stats.intervals.append(interval)
+                if expected_interval and interval > expected_interval * 1.5:
+                    stats.gap_frames += int(round(interval / expected_interval)) - 1
+            stats.last_frame_arrival = arrival
+        stats.packets += 1
+        stats.bytes += len(data)
+
+        if not self.model_show:
+            if self.process_packet(data):
+                self.show_log.append((self.show_key, arrival))
+            return
+
+        self.drain(arrival)
+        if len(self.rx_queue) >= self.rx_queue_packets:
+            stats.rx_overflows += 1
+        else:
+            self.rx_queue.append((arrival, data))
+            self.drain(arrival)
+
+    def drain(self, now: float):
+        """Process queued packets the board would have finished reading by now"""
+        while self.rx_queue:
+            arrival, data = self.rx_queue[0]
+            start = max(self.busy_until, arrival)
+            if start > now:
+                break
+            self.rx_queue.popleft()
+            shown = self.process_packet(data)
+            if shown:
+                self.show_log.append((self.show_key, start))
+            self.busy_until = start + self.loop_time + (self.show_time if shown else 0.0)
+
+    def process_packet(self, data: bytes) -> bool:
+        """Decode a packet the way handleIncomingPacket() does; returns True if the strip was shown"""
+        stats = self.stats
+        if len(data) > self.packet_size:
+            stats.oversize_packets += 1
+            data = data[:self.packet_size]
+        
+        if data and data[0] == OP_PIXELS:
+            return self.process_chunk(data)
+        if data and data[0] == OP_FILL:
+            return self.process_fill(data)
+        if data and data[0] == OP_DELTA:
+            return self.process_delta(data)
+        if data and data[0] == OP_CODED:
+            return self.process_coded(data)
+        if data and data[0] == OP_SHOW:
+            return self.process_show(data)
+
+        if len(data) < 3:
+            stats.short_packets += 1
+            return False
+
+        # Brightness is applied before the length check, as in the sketch
+        self.brightness = data[1]
+
+        if len(data) - 2 < self.num_leds * 3:
+            stats.incomplete_packets += 1
+            return False
+
+        self.leds[:] = np.frombuffer(data, dtype=np.uint8, count=self.num_leds * 3, offset=2).reshape(-1, 3)
+        self.show_key = ("frame", stats.frames_shown)
+        stats.frames_shown += 1
+        return True
+
+    def process_chunk(self, data: bytes) -> bool:
+        """Decode an OP_PIXELS datagram the way handlePixelChunk() does"""
+        stats = self.stats
+        stats.chunks += 1
+        if len(data) < CHUNK_HEADER_SIZE:
+            stats.short_packets += 1
+            return False
+
+        _, _, brightness, flags, frame_number, offset, count = parse_chunk_header(data)
+        if offset + count > self.num_leds or len(data) - CHUNK_HEADER_SIZE < count * 3:
+            stats.invalid_chunks += 1
+            return False
+
+        self.brightness = brightness
+        if frame_number != self.chunk_frame:
+            self.chunk_frame = frame_number
+            self.chunk_pixels = 0
+        self.leds[offset:offset + count] = np.frombuffer(data, dtype=np.uint8, count=count * 3,
+                                                         offset=CHUNK_HEADER_SIZE).reshape(-1, 3)
+        self.chunk_pixels += count
+
+        if not flags & (FLAG_SHOW | FLAG_LATCH):
+            return False
+
+        # The last chunk ends the frame, so the frame spans offset + count pixels
+        if self.chunk_pixels < offset + count:
+            stats.partial_frames += 1
+        return self.end_frame(frame_number, flags)
+
+    def process_fill(self, data: bytes) -> bool:
+        """Decode an OP_FILL datagram the way handlePixelFill() does"""
+        stats = self.stats
+        stats.fills += 1
+        if len(data) < FILL_PACKET_SIZE:
+            stats.short_packets += 1
+            return False
+
+        _, _, self.brightness, flags, frame_number = parse_frame_header(data)
+        self.leds[:] = tuple(data[FRAME_HEADER_SIZE:FILL_PACKET_SIZE])
+        return self.end_frame(frame_number, flags)
+
+    def process_delta(self, data: bytes) -> bool:
+        """Decode an OP_DELTA datagram the way handlePixelDelta() does, stopping at the first bad range"""
+        stats = self.stats
+        stats.deltas += 1
+        if len(data) < FRAME_HEADER_SIZE:
+            stats.short_packets += 1
+            return False
+
+        _, _, self.brightness, flags, frame_number = parse_frame_header(data)
+        position = FRAME_HEADER_SIZE
+        while position + RANGE_HEADER_SIZE <= len(data):
+            offset, count = RANGE_HEADER.unpack_from(data, position)
+            position += RANGE_HEADER_SIZE
+            if offset + count > self.num_leds or position + count * 3 > len(data):
+                stats.invalid_deltas += 1
+                return False
+            self.leds[offset:offset + count] = np.frombuffer(data, dtype=np.uint8, count=count * 3,
+                                                             offset=position).reshape(-1, 3)
+            position += count * 3
+
+        if not flags & (FLAG_SHOW | FLAG_LATCH):
+            return False
+        return self.end_frame(frame_number, flags)
+
+    def process_coded(self, data: bytes) -> bool:
+        """Decode an OP_CODED datagram the way handleCodedFrame() does"""
+        stats = self.stats
+        try:
+            header, pixels = decode_coded_frame(data)
+        except ValueError:
+            stats.invalid_coded += 1
+            return False
+        _, _, brightness, flags, frame_number, codec, count = header
+        if count > self.num_leds:
+            stats.invalid_coded += 1
+            return False
+
+        stats.coded[CODEC_NAMES[codec]] += 1
+        self.brightness = brightness
+        self.leds[:count] = pixels
+        return self.end_frame(frame_number, flags)
+
+    def process_show(self, data: bytes) -> bool:
+        """Decode an OP_SHOW message the way handleShow() does: show the held frame, if any"""
+        stats = self.stats
+        stats.shows += 1
+        if len(data) < FRAME_HEADER_SIZE:
+            stats.short_packets += 1
+            return False
+        if not self.latch_pending:
+            stats.empty_shows += 1
+            return False
+
+        self.latch_pending = False
+        self.show_key = ("show", parse_frame_header(data)[4])
+        stats.frames_shown += 1
+        return True
+
+    def end_frame(self, frame_number: int, flags: int) -> bool:
+        """Complete an extended frame, counting skipped frame numbers; shows it unless it is held for OP_SHOW"""
+        stats = self.stats
+        if self.last_shown_frame is not None:
+            stats.dropped_frames += (frame_number - self.last_shown_frame - 1) & 0xFFFF
+        self.last_shown_frame = frame_number
+        if flags & FLAG_LATCH:
+            self.latch_pending = True
+            return False
+
+        self.show_key = ("frame", stats.frames_shown)
+        stats.frames_shown += 1
+        return True
+
+def is_frame_end(data: bytes) -> bool:
+    """Whether a datagram completes a frame: every legacy packet, an extended datagram flagged to show, or OP_SHOW"""
+    if is_extended(data):
+        return len(data) >= FRAME_HEADER_SIZE and (data[0] == OP_SHOW or bool(data[3] & FLAG_SHOW))
+    return True
+
+class ReceiverEmulator:
+    """Emulates one ESP32 per strip id on a single UDP socket"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = UDP_PORT, num_leds: int = NUM_LEDS,
+                 strip_id: Optional[int] = None, model_show: bool = False, led_write_us: float = LED_WRITE_US,
+                 expected_fps: Optional[float] = None):
+        self.num_leds = num_leds
+        self.strip_id = strip_id  # Emulate only this board; packets for other strips are ignored
+        self.model_show = model_show
+        self.led_write_us = led_write_us
+        self.expected_interval = 1.0 / expected_fps if expected_fps else None
+        self.boards: Dict[int, EmulatedBoard] = {}
+        self.foreign_packets = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.1)
+        self.address = self.sock.getsockname()
+
+    def get_board(self, strip_id: int) -> EmulatedBoard:
+        board = self.boards.get(strip_id)
+        if board is None:
+            board = EmulatedBoard(strip_id, self.num_leds, self.model_show, self.led_write_us)
+            self.boards[strip_id] = board
+        return board
+
+    def handle_packet(self, data: bytes, arrival: float):
+        """Route a datagram to the board it is addressed to"""
+        if len(data) < 3:
+            # Rejected as too short before the sketch looks at the strip id
+            strip_id = self.strip_id if self.strip_id is not None else (data[0] if data else 0)
+        else:
+            strip_id = data[1] if is_extended(data) else data[0]
+            if strip_id == SHOW_ALL_STRIPS and data[0] == OP_SHOW:
+                # Broadcast latch: every emulated board gets its own copy
+                for board_id, board in self.boards.items():
+                    if self.strip_id is None or board_id == self.strip_id:
+                        board.receive(data, arrival, self.expected_interval)
+                return
+            if self.strip_id is not None and strip_id != self.strip_id:
+                self.foreign_packets += 1
+                return
+        self.get_board(strip_id).receive(data, arrival, self.expected_interval)
+
+    def serve(self, duration: Optional[float] = None, report_interval: Optional[float] = None):
+        """Receive packets until the duration elapses or the process is interrupted"""
+        start = time.monotonic()
+        next_report = start + report_interval if report_interval else None
+        buffer = bytearray(65536)
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                try:
+                    length = self.sock.recv_into(buffer)
+                    self.handle_packet(bytes(buffer[:length]), time.monotonic())
+                except socket.timeout:
+                    pass
+                if next_report and time.monotonic() >= next_report:
+                    print(self.format_report())
+                    next_report += report_interval
+        except KeyboardInterrupt:
+            pass
+
+    def report(self) -> dict:
+        """Per-strip statistics"""
+        now = time.monotonic()
+        for board in self.boards.values():
+            board.drain(now)
+        report = {
+            'strips': {str(strip_id): board.stats.to_dict(self.expected_interval)
+                       for strip_id, board in sorted(self.boards.items())},
+            'foreign_packets': self.foreign_packets,
+            'model_show': self.model_show,
+        }
+        skew = self.strip_skew()
+        if skew:
+            report['strip_skew'] = skew
+        return report
+
+    def strip_skew(self) -> Optional[dict]:
+        """Spread between the moments the boards showed the same frame, over frames every board showed"""
+        if len(self.boards) < 2:
+            return None
+        show_times: Dict[tuple, list] = {}
+        for board in self.boards.values():
+            for key, shown_at in board.show_log:
+                show_times.setdefault(key, []).append(shown_at)
+        skews_ms = sorted((max(times) - min(times)) * 1000 for times in show_times.values()
+                          if len(times) == len(self.boards))
+        if not skews_ms:
+            return None
+        return {
+            'frames': len(skews_ms),
+            'mean_ms': statistics.fmean(skews_ms),
+            'p99_ms': skews_ms[min(len(skews_ms) - 1, int(len(skews_ms) * 0.99))],
+            'max_ms': skews_ms[-1],
+        }
+
+    def format_report(self) -> str:
+        lines = []
+        report = self.report()
+        for strip_id, stats in report['strips'].items():
+            line = (f"Strip {strip_id}: {stats['packets']} packets, {stats['frames_shown']} shown, "
+                    f"{stats['packet_rate']:.1f} pkt/s, {stats['mbit_per_s']:.2f} Mbit/s, "
+                    f"interval {stats['interval_mean_ms']:.2f} ms (jitter {stats['jitter_ms']:.2f}, "
+                    f"max {stats['interval_max_ms']:.2f}), short {stats['short_packets']}, "
+                    f"incomplete {stats['incomplete_packets']}, oversize {stats['oversize_packets']}, "
+                    f"rx overflow {stats['rx_overflows']}")
+            if 'gap_frames' in stats:
+                line += f", gap frames {stats['gap_frames']}"
+            if 'chunks' in stats:
+                line += (f", chunks {stats['chunks']} (invalid {stats['invalid_chunks']}), "
+                         f"partial frames {stats['partial_frames']}, dropped frames {stats['dropped_frames']}")
+            if 'deltas' in stats:
+                line += f", fills {stats['fills']}, deltas {stats['deltas']} (invalid {stats['invalid_deltas']})"
+            if 'coded' in stats:
+                codecs = ", ".join(f"{name} {count}" for name, count in stats['coded'].items())
+                line += f", coded {codecs} (invalid {stats['invalid_coded']})"
+            if 'shows' in stats:
+                line += f", shows {stats['shows']} (nothing held {stats['empty_shows']})"
+            lines.append(line)
+        skew = report.get('strip_skew')
+        if skew:
+            lines.append(f"Strip skew over {skew['frames']} frames: mean {skew['mean_ms']:.3f} ms, "
+                         f"p99 {skew['p99_ms']:.3f} ms, max {skew['max_ms']:.3f} ms")
+        return "\n".join(lines) if lines else "No packets received"
+
+    def close(self):
+        self.sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate ESP32 LED receivers on this machine")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=UDP_PORT, help="UDP port to bind")
+    parser.add_argument("--num-leds", type=int, default=NUM_LEDS, help="NUM_LEDS compiled into the receiver")
+    parser.add_argument("--strip-id", type=int, help="Emulate only this STRIP_ID (default: one board per strip id)")
+    parser.add_argument("--model-show", action="store_true",
+                        help="Model the time the board spends in FastLED.show() and its small receive queue")
+    parser.add_argument("--led-us", type=float, default=LED_WRITE_US, help="Microseconds to write one LED")
+    parser.add_argument("--expected-fps", type=float, help="Sender frame rate, to count missing frames from gaps")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between reports (0 to disable)")
+    parser.add_argument("--json", action="store_true", help="Print the final report as JSON")
+    args = parser.parse_args()
+
+    emulator = ReceiverEmulator(args.host, args.port, args.num_leds, args.strip_id,
+                                args.model_show, args.led_us, args.expected_fps)
+    print(f"ESP32 emulator listening on {emulator.address[0]}:{emulator.address[1]}")
+    try:
+        emulator.serve(args.duration, args.report_interval or None)
+    finally:
+        emulator.close()
+
+    if args.json:
+        print(json.dumps(emulator.report(), indent=2))
+    else:
+        print(emulator.format_report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Frame recorder and replay for the LED controller
+Captures the exact output of calculate_led_data for every strip into a compact binary file, and
+memory-maps recordings so pre-rendered shows can be sent at their recorded timing without running
+any mode code; recordings double as regression fixtures for the renderer and the transport
+
+File layout (little-endian):
+    header      "LEDFRAME", version (u16), strip count (u16), nominal FPS (f32), then one u32 LED count per strip,
+                zero-padded to a multiple of 8 bytes
+    frames      fixed-size records: timestamp in ns since the first frame (i64), brightness (u8),
+                then every strip's RGB bytes in strip order
+"""
+
+import argparse
+import mmap
+import struct
+from typing import List, Optional, Tuple
+import numpy as np
+
+MAGIC = b"LEDFRAME"
+VERSION = 1
+FILE_HEADER = struct.Struct("<8sHHf")
+STRIP_LENGTH = struct.Struct("<I")
+FRAME_PREFIX = struct.Struct("<qB")
+
+def header_size(num_strips: int) -> int:
+    size = FILE_HEADER.size + num_strips * STRIP_LENGTH.size
+    return (size + 7) & ~7
+
+def frame_dtype(num_leds_per_strip: list) -> np.dtype:
+    """Structured dtype of one frame record"""
+    return np.dtype([('timestamp', '<i8'), ('brightness', 'u1'), ('pixels', 'u1', (sum(num_leds_per_strip) * 3,))])
+
+class FrameRecorder:
+    """Appends rendered frames to a recording file"""
+
+    def __init__(self, path: str, num_leds_per_strip: list, fps: float):
+        self.path = path
+        self.num_leds_per_strip = list(num_leds_per_strip)
+        self.frame_size = frame_dtype(self.num_leds_per_strip).itemsize
+        self.frame_count = 0
+        self.first_timestamp = None
+        self.file = open(path, "wb")
+        header = bytearray(header_size(len(self.num_leds_per_strip)))
+        FILE_HEADER.pack_into(header, 0, MAGIC, VERSION, len(self.num_leds_per_strip), fps)
+        for strip_index, count in enumerate(self.num_leds_per_strip):
+            STRIP_LENGTH.pack_into(header, FILE_HEADER.size + strip_index * STRIP_LENGTH.size, count)
+        self.file.write(header)
+
+    def write(self, timestamp_ns: int, brightness: int, frames: list):
+        """Append one frame: a monotonic timestamp, the brightness and every strip's (n_leds, 3) pixels"""
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp_ns
+        self.file.write(FRAME_PREFIX.pack(timestamp_ns - self.first_timestamp, brightness))
+        for count, pixels in zip(self.num_leds_per_strip, frames):
+            if pixels.shape != (count, 3):
+                raise ValueError(f"Expected a ({count}, 3) frame, got {pixels.shape}")
+            self.file.write(np.ascontiguousarray(pixels, dtype=np.uint8))
+        self.frame_count += 1
+
+    def close(self):
+        self.file.close()
+
+class FrameReplay:
+    """A memory-mapped recording; frames are read-only views into the file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < FILE_HEADER.size:
+            raise ValueError(f"{path}: too short for a recording header")
+        magic, version, num_strips, fps = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} frame recording")
+        if len(self.map) < header_size(num_strips):
+            raise ValueError(f"{path}: truncated recording header")
+        self.fps = fps
+        self.num_leds_per_strip = [STRIP_LENGTH.unpack_from(self.map, FILE_HEADER.size + i * STRIP_LENGTH.size)[0]
+                                   for i in range(num_strips)]
+
+        # A partly written last frame, e.g. from an interrupted recording, is ignored
+        dtype = frame_dtype(self.num_leds_per_strip)
+        offset = header_size(num_strips)
+        self.frame_count = (len(self.map) - offset) // dtype.itemsize
+        self.records = np.ndarray((self.frame_count,), dtype=dtype, buffer=self.map, offset=offset)
+        self.timestamps = self.records['timestamp']
+        self.strip_offsets = np.concatenate(([0], np.cumsum(self.num_leds_per_strip) * 3)).tolist()
+
+    @property
+    def duration_ns(self) -> int:
+        return int(self.timestamps[-1]) if self.frame_count else 0
+
+    @property
+    def frame_interval_ns(self) -> int:
+        return int(round(1e9 / self.fps)) if self.fps > 0 else 0
+
+    def frame(self, index: int) -> Tuple[int, List[np.ndarray]]:
+        """Brightness and every strip's (n_leds, 3) pixels for one frame"""
+        record = self.records[index]
+        pixels = record['pixels']
+        frames = [pixels[start:end].reshape(-1, 3)
+                  for start, end in zip(self.strip_offsets, self.strip_offsets[1:])]
+        return int(record['brightness']), frames
+
+    def first_difference(self, other: "FrameReplay") -> Optional[int]:
+        """Index of the first frame whose brightness or pixels differ from another recording, or None
+
+        Timestamps are not compared. Recordings of different strip lengths differ at frame 0,
+        and a shorter recording differs at its end.
+        """
+        if self.num_leds_per_strip != other.num_leds_per_strip:
+            return 0
+        count = min(self.frame_count, other.frame_count)
+        same = ((self.records['brightness'][:count] == other.records['brightness'][:count]) &
+                np.all(self.records['pixels'][:count] == other.records['pixels'][:count], axis=1))
+        mismatches = np.flatnonzero(~same)
+        if len(mismatches):
+            return int(mismatches[0])
+        return count if self.frame_count != other.frame_count else None
+
+    def close(self):
+        self.records = None
+        self.timestamps = None
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # A frame is still referenced; the mapping goes when it is released
+        self.file.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compare LED frame recordings")
+    parser.add_argument("recording", help="Recording made with led_controller.py --record")
+    parser.add_argument("--compare", help="Report the first frame that differs from this recording")
+    args = parser.parse_args()
+
+    replay = FrameReplay(args.recording)
+    strips = ", ".join(str(count) for count in replay.num_leds_per_strip)
+    print(f"{args.recording}: {replay.frame_count} frames, {replay.duration_ns / 1e9:.2f} s "
+          f"at {replay.fps:g} FPS nominal, strips of {strips} LEDs")
+    if args.compare:
+        other = FrameReplay(args.compare)
+        index = replay.first_difference(other)
+        print(f"Identical to {args.compare}" if index is None else f"First difference from {args.compare} at frame {index}")
+        other.close()
+        replay.close()
+        raise SystemExit(0 if index is None else 1)
+    replay.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Frame scheduler for the LED controller
+Paces the animation loop against absolute monotonic deadlines and keeps rolling frame-time statistics
+"""
+
+import time
+from collections import deque
+
+# Overrun policies
+OVERRUN_SKIP = "skip"         # Drop the missed frame slots and realign to the next future deadline
+OVERRUN_CATCH_UP = "catchup"  # Run late frames back to back until the schedule is met again
+
+STATS_WINDOW = 600       # Number of recent frames kept for statistics
+MAX_CATCH_UP_FRAMES = 10  # Catch-up falls back to realigning when further behind than this
+
+class FrameScheduler:
+    """Schedules frames at a fixed rate using time.monotonic_ns deadlines"""
+
+    def __init__(self, fps: float, overrun_policy: str = OVERRUN_SKIP, stats_window: int = STATS_WINDOW):
+        self.set_fps(fps)
+        self.set_overrun_policy(overrun_policy)
+        self.next_deadline = None
+
+        # Rolling statistics
+        self.frame_starts = deque(maxlen=stats_window)  # ns
+        self.render_times = deque(maxlen=stats_window)  # ns
+        self.frame_count = 0
+        self.deadline_misses = 0
+        self.skipped_frames = 0
+
+    def set_fps(self, fps: float):
+        """Set the target frame rate"""
+        if fps <= 0:
+            raise ValueError(f"FPS must be positive, got {fps}")
+        self.fps = fps
+        self.frame_interval_ns = int(round(1e9 / fps))
+
+    def set_overrun_policy(self, overrun_policy: str):
+        """Set how frames that miss their deadline are handled"""
+        if overrun_policy not in (OVERRUN_SKIP, OVERRUN_CATCH_UP):
+            raise ValueError(f"Unknown overrun policy: {overrun_policy}")
+        self.overrun_policy = overrun_policy
+
+    def wait_for_frame(self) -> int:
+        """Sleep until the next frame deadline and return the frame start time (ns)"""
+        now = time.monotonic_ns()
+        if self.next_deadline is None:
+            self.next_deadline = now
+        elif now < self.next_deadline:
+            time.sleep((self.next_deadline - now) / 1e9)
+            now = time.monotonic_ns()
+
+        self.frame_starts.append(now)
+        return now
+
+    def wait_until(self, deadline: int) -> int:
+        """Sleep until an absolute deadline (ns), e.g. a recorded frame's time, and return the frame start time"""
+        self.next_deadline = deadline
+        return self.wait_for_frame()
+
+    def frame_done(self, frame_start: int):
+        """Record a finished frame and advance to the next absolute deadline"""
+        now = time.monotonic_ns()
+        self.render_times.append(now - frame_start)
+        self.frame_count += 1
+
+        # Deadlines advance by whole intervals, so sleep jitter never accumulates
+        self.next_deadline += self.frame_interval_ns
+        if now <= self.next_deadline:
+            return
+
+        self.deadline_misses += 1
+        missed = (now - self.next_deadline) // self.frame_interval_ns + 1
+        if self.overrun_policy == OVERRUN_SKIP or missed > MAX_CATCH_UP_FRAMES:
+            self.next_deadline += missed * self.frame_interval_ns
+            self.skipped_frames += missed
+
+    def get_stats(self) -> dict:
+        """Get achieved FPS, render time percentiles and deadline counters"""
+        render_ms = sorted(t / 1e6 for t in self.render_times)
+        stats = {
+            'target_fps': self.fps,
+            'achieved_fps': 0.0,
+            'render_p50_ms': _percentile(render_ms, 50),
+            'render_p99_ms': _percentile(render_ms, 99),
+            'render_max_ms': render_ms[-1] if render_ms else 0.0,
+            'frames': self.frame_count,
+            'deadline_misses': self.deadline_misses,
+            'skipped_frames': self.skipped_frames,
+            'overrun_policy': self.overrun_policy,
+        }
+        if len(self.frame_starts) > 1:
+            span = self.frame_starts[-1] - self.frame_starts[0]
+            if span > 0:
+                stats['achieved_fps'] = (len(self.frame_starts) - 1) * 1e9 / span
+        return stats
+
+    def format_stats(self) -> str:
+        """Get a one-line summary of the frame statistics"""
+        stats = self.get_stats()
+        return (f"FPS {stats['achieved_fps']:.1f}/{stats['target_fps']:g}, "
+                f"render p50 {stats['render_p50_ms']:.2f} ms, p99 {stats['render_p99_ms']:.2f} ms, "
+                f"max {stats['render_max_ms']:.2f} ms, "
+                f"misses {stats['deadline_misses']}/{stats['frames']}, "
+                f"skipped {stats['skipped_frames']} ({stats['overrun_policy']})")
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, int(round(percent / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
@@ -0,0 +1,247 @@
+"""
+Input backends for the LED controller
+Audio sources (USB microphone, synthetic signal, WAV file) and simulated encoders,
+so the controller can run headless without RPi.GPIO or PyAudio installed
+"""
+
+import time
+import threading
+import wave
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+import numpy as np
+
+# Audio source names accepted by create_audio_source
+AUDIO_BACKENDS = ("mic", "synthetic", "wav", "none")
+
+class MicrophoneSource:
+    """USB microphone input through PyAudio (imported on open)"""
+
+    def __init__(self, sample_rate: int, chunk_size: int):
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.audio = None
+        self.stream = None
+        self.on_chunk = None
+        self.pyaudio = None
+
+    def open(self, on_chunk: Callable[[np.ndarray], None]) -> bool:
+        """Initialize PyAudio for microphone input"""
+        self.on_chunk = on_chunk
+        try:
+            import pyaudio
+            self.pyaudio = pyaudio
+            self.audio = pyaudio.PyAudio()
+
+            # Find default input device
+            device_info = self.audio.get_default_input_device_info()
+            print(f"Using audio device: {device_info['name']}")
+
+            # Open audio stream
+            self.stream = self.audio.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.sample_rate,
+                input=True,
+                frames_per_buffer=self.chunk_size,
+                stream_callback=self.audio_callback,
+                start=False
+            )
+            return True
+
+        except Exception as e:
+            print(f"Failed to initialize audio: {e}")
+            self.audio = None
+            self.stream = None
+            return False
+
+    def audio_callback(self, in_data, frame_count, time_info, status):
+        """Audio stream callback for real-time processing"""
+        if status:
+            print(f"Audio callback status: {status}")
+
+        # Convert bytes to numpy array
+        self.on_chunk(np.frombuffer(in_data, dtype=np.int16))
+
+        return (in_data, self.pyaudio.paContinue)
+
+    def start(self):
+        if self.stream:
+            self.stream.start_stream()
+
+    def stop(self):
+        if self.stream:
+            self.stream.stop_stream()
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+        if self.audio:
+            self.audio.terminate()
+
+class ChunkThreadSource(ABC):
+    """Base for sources that produce chunks from a thread at real-time pace"""
+
+    def __init__(self, sample_rate: int, chunk_size: int, realtime: bool = True):
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self.on_chunk = None
+        self.running = False
+        self.thread = None
+
+    def open(self, on_chunk: Callable[[np.ndarray], None]) -> bool:
+        self.on_chunk = on_chunk
+        return True
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+
+    def _run(self):
+        chunk_ns = int(self.chunk_size * 1e9 / self.sample_rate)
+        deadline = time.monotonic_ns()
+        while self.running:
+            chunk = self.read_chunk()
+            if chunk is None:
+                break
+            if self.realtime:
+                deadline += chunk_ns
+                delay = deadline - time.monotonic_ns()
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+            self.on_chunk(chunk)
+        self.running = False
+
+    @abstractmethod
+    def read_chunk(self) -> Optional[np.ndarray]:
+        """Return the next int16 chunk, or None when the source is exhausted"""
+
+class SyntheticAudioSource(ChunkThreadSource):
+    """Generated test signal: a 120 BPM kick, a sustained mid chord and noise hi-hats"""
+
+    def __init__(self, sample_rate: int, chunk_size: int, realtime: bool = True,
+                 bpm: float = 120.0, seed: Optional[int] = None):
+        super().__init__(sample_rate, chunk_size, realtime)
+        self.beat_samples = int(sample_rate * 60 / bpm)
+        self.position = 0
+        self.rng = np.random.default_rng(seed)
+
+    def read_chunk(self) -> np.ndarray:
+        n = np.arange(self.position, self.position + self.chunk_size)
+        self.position += self.chunk_size
+        t = n / self.sample_rate
+        beat_phase = (n % self.beat_samples) / self.sample_rate
+        offbeat_phase = ((n + self.beat_samples // 2) % self.beat_samples) / self.sample_rate
+
+        kick = np.sin(2 * np.pi * 55 * t) * np.exp(-beat_phase * 12)
+        chord = 0.25 * (np.sin(2 * np.pi * 440 * t) + np.sin(2 * np.pi * 660 * t))
+        hihat = self.rng.normal(0, 0.3, self.chunk_size) * np.exp(-offbeat_phase * 40)
+
+        signal = 0.6 * kick + chord + hihat
+        return (np.clip(signal, -1, 1) * 16000).astype(np.int16)
+
+class WavFileAudioSource(ChunkThreadSource):
+    """16-bit PCM WAV file playback, mixed down to mono and optionally looped"""
+
+    def __init__(self, path: str, chunk_size: int, realtime: bool = True, loop: bool = True):
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+            channels = wav.getnchannels()
+            sample_rate = wav.getframerate()
+            frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        super().__init__(sample_rate, chunk_size, realtime)
+        self.samples = frames.reshape(-1, channels).mean(axis=1).astype(np.int16)
+        self.loop = loop
+        self.position = 0
+
+    def read_chunk(self) -> Optional[np.ndarray]:
+        if self.position + self.chunk_size > len(self.samples):
+            if not self.loop or len(self.samples) < self.chunk_size:
+                return None
+            self.position = 0
+        chunk = self.samples[self.position:self.position + self.chunk_size]
+        self.position += self.chunk_size
+        return chunk
+
+class NullAudioSource:
+    """No audio input; music mode stays silent"""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+
+    def open(self, on_chunk: Callable[[np.ndarray], None]) -> bool:
+        return False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+def create_audio_source(backend: str, sample_rate: int, chunk_size: int, wav_path: str = None):
+    """Create an audio source by name (see AUDIO_BACKENDS)"""
+    if backend == "mic":
+        return MicrophoneSource(sample_rate, chunk_size)
+    elif backend == "synthetic":
+        return SyntheticAudioSource(sample_rate, chunk_size)
+    elif backend == "wav":
+        if not wav_path:
+            raise ValueError("The wav audio backend needs a WAV file path")
+        return WavFileAudioSource(wav_path, chunk_size)
+    elif backend == "none":
+        return NullAudioSource(sample_rate)
+    raise ValueError(f"Unknown audio backend: {backend}")
+
+class NullEncoder:
+    """Encoder stand-in that never reports an action"""
+
+    def get_encoder_action(self):
+        return None
+
+    def cleanup(self):
+        pass
+
+class ScriptedEncoder:
+    """Encoder stand-in that replays a fixed sequence of actions at a set interval
+
+    Actions are the ones EncoderHandler.get_encoder_action returns, e.g.
+    "mode_up", "mode_down", "brightness_up", "brightness_down", "toggle_music_mode".
+    """
+
+    def __init__(self, actions: List[str], interval: float = 1.0, loop: bool = True):
+        self.actions = list(actions)
+        self.interval = interval
+        self.loop = loop
+        self.index = 0
+        self.next_time = time.monotonic() + interval
+
+    def get_encoder_action(self):
+        if self.index >= len(self.actions) or time.monotonic() < self.next_time:
+            return None
+
+        action = self.actions[self.index]
+        self.index += 1
+        if self.loop and self.index == len(self.actions):
+            self.index = 0
+        self.next_time += self.interval
+        return action
+
+    def cleanup(self):
+        pass
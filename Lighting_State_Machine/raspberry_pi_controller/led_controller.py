@@ -5,19 +5,28 @@ Calculates LED pixel values and sends data to three ESP32 controllers
 Each ESP32 controls 1000 LEDs (3000 total)
 """
 
-import socket
-import json
 import time
 import math
-import random
 import threading
-from typing import List, Tuple
+import argparse
+from typing import NamedTuple, Optional
 import numpy as np
-import RPi.GPIO as GPIO
-import pyaudio
-import wave
-from scipy.fft import fft, fftfreq
 from collections import deque
+from color import hsv_to_rgb, hsv_to_rgb_array, hsv_lut, LUT_HUES
+from frame_scheduler import FrameScheduler, OVERRUN_SKIP
+from input_backends import AUDIO_BACKENDS, NullEncoder, ScriptedEncoder, create_audio_source
+from transport import UDPTransport
+from output_drivers import SyncGroup, create_output_driver, parse_output_target
+from led_protocol import ChunkedFramer, DeltaEncoder, FrameCodec, ShowLatch, MAX_DATAGRAM_PAYLOAD, KEYFRAME_INTERVAL
+from render_workers import RenderPool
+from frame_recorder import FrameRecorder, FrameReplay
+from animation_cache import AnimationCache
+from effects import AuroraEngine, FireEngine, TwinkleEngine
+from modes import Mode, MODE_REGISTRY
+
+# RPi.GPIO is imported when an EncoderHandler is created, so the controller
+# can also run headless on machines without the Raspberry Pi libraries
+GPIO = None
 
 # LED Configuration
 NUM_LEDS_PER_STRIP = [5, 5, 5]  # Different lengths for each strip
@@ -46,10 +55,26 @@ ESP32_IPS = [
     "192.168.1.102",  # ESP32 #2 - Second 900 LEDs  
     "192.168.1.103",  # ESP32 #3 - Third 1000 LEDs
 ]
+# Entries may also select a standard protocol (see output_drivers.py), e.g.
+# "ddp://192.168.1.104" for WLED or "sacn://multicast/1" for E1.31 universes 1, 2, ...
 
 # Communication settings
 UDP_PORT = 8888
+PACKET_HEADER_SIZE = 2  # strip_index + brightness
+CHUNKED_FRAMING = False  # Split frames into MTU-sized OP_PIXELS datagrams (see led_protocol.py)
+DELTA_ENCODING = False  # Send only changed pixel ranges or a fill, with a full keyframe every KEYFRAME_INTERVAL
+COMPRESSION = False  # Send each frame as one OP_CODED datagram with the smallest of RLE, palette and raw
+BATCHED_SEND = True  # Flush all strips' datagrams in one sendmmsg call where available
+SYNC_OUTPUTS = True  # DDP/E1.31 receivers latch together on a push/sync packet sent after every strip
+SYNC_LATCH = False  # ESP32s hold each frame until an OP_SHOW sent after every strip's data
+LATCH_BROADCAST_ADDRESS = None  # e.g. "192.168.1.255" to broadcast OP_SHOW; None sends it to each ESP32
 SEND_INTERVAL = 0.05  # Send data every 50ms (20 FPS)
+STATIC_FRAMES = True  # Render and send unchanged static frames (fixed colors with music off, strips off) only as keepalives
+KEEPALIVE_INTERVAL = 1.0  # Seconds between resends of an unchanged frame; the ESP32s blank after 5 s without packets
+ANIMATION_CACHE = False  # Serve RAINBOW and AURORA's base colors from one cached period per strip length
+ANIMATION_CACHE_BUDGET = 64 * 1024 * 1024  # Bytes of cached frames across all modes and strip lengths
+RENDER_WORKERS = 0  # Worker processes rendering the strips in parallel (see render_workers.py); 0 renders in the animation thread
+OVERRUN_POLICY = OVERRUN_SKIP  # Late frames: "skip" missed slots or "catchup" back to back
 
 # KY-040 Encoder Configuration (matching ESP32 setup)
 ENCODER_CLK_PIN = 17  # GPIO 17 (D2 equivalent)
@@ -64,15 +89,26 @@ AUDIO_BUFFER_SIZE = 10   # Number of audio chunks to buffer
 
 # Animation state
 class AnimationState:
-    def __init__(self):
+    """Animation counters plus preallocated per-strip arrays, updated in place every frame"""
+    __slots__ = ("current_mode", "brightness", "hue", "animation_step",
+                 "rngs", "fire", "aurora", "twinkle", "fire_heat", "twinkle_state", "aurora_intensity",
+                 "aurora_phase", "aurora_hue",
+                 "frequency_bands", "audio_level", "bass_level", "mid_level", "high_level")
+
+    def __init__(self, num_leds_per_strip=NUM_LEDS_PER_STRIP, seed=None):
         self.current_mode = 0
         self.brightness = 255
         self.hue = 0
         self.animation_step = 0
-        # Initialize arrays for each strip with different lengths
-        self.fire_heat = [[0] * count for count in NUM_LEDS_PER_STRIP]
-        self.twinkle_state = [[random.randint(0, 255) for _ in range(count)] for count in NUM_LEDS_PER_STRIP]
-        self.aurora_intensity = [[0] * count for count in NUM_LEDS_PER_STRIP]
+        # One random generator per strip, so a seed reproduces every strip however they are rendered
+        self.rngs = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(len(num_leds_per_strip))]
+        self.fire = [FireEngine(count, rng) for count, rng in zip(num_leds_per_strip, self.rngs)]
+        self.aurora = [AuroraEngine(count, rng) for count, rng in zip(num_leds_per_strip, self.rngs)]
+        self.twinkle = [TwinkleEngine(count, rng) for count, rng in zip(num_leds_per_strip, self.rngs)]
+        # Per-strip arrays, owned by the engines; all values are 0-255
+        self.fire_heat = [engine.heat for engine in self.fire]
+        self.twinkle_state = [engine.state for engine in self.twinkle]
+        self.aurora_intensity = [engine.intensity for engine in self.aurora]
         self.aurora_phase = 0
         self.aurora_hue = 96
         
@@ -83,6 +119,10 @@ class AnimationState:
         self.mid_level = 0.0
         self.high_level = 0.0
 
+# Periods of the cycling animation counters
+AURORA_PHASE_PERIOD = 1000  # aurora_phase wraps here
+COUNTER_PERIODS = {'hue': 360, 'aurora_phase': AURORA_PHASE_PERIOD}  # Counters a mode can advance
+
 # LED modes
 class LEDModes:
     WHITE = 0
@@ -103,17 +143,30 @@ class LEDModes:
     CHASE = 15
     BREATHING = 16
 
+class SpectrumSnapshot(NamedTuple):
+    """One complete audio analysis, published by replacing the reference as a whole"""
+    spectrum: np.ndarray  # Read-only band levels; indices 0-2 hold the bass/mid/high aggregates
+    audio_level: float
+    timestamp: float      # time.monotonic() when the analysis finished
+    sequence: int         # Number of chunks analyzed so far
+
 class AudioProcessor:
-    """Handles USB microphone input and FFT frequency analysis"""
+    """Handles audio input (USB microphone by default) and FFT frequency analysis"""
     
-    def __init__(self):
-        self.audio = None
-        self.stream = None
+    def __init__(self, source=None):
+        # Audio input backend; see input_backends for the alternatives to the microphone
+        self.source = source if source is not None else create_audio_source("mic", SAMPLE_RATE, CHUNK_SIZE)
+        self.sample_rate = self.source.sample_rate
+        self.available = False
         self.running = False
         self.audio_thread = None
-        self.audio_buffer = deque(maxlen=AUDIO_BUFFER_SIZE)
-        self.latest_frequency_data = [0.0] * NUM_FREQUENCY_BANDS
-        self.latest_audio_level = 0.0
+        self.audio_buffer = deque(maxlen=AUDIO_BUFFER_SIZE)  # Chunks waiting for analysis
+        self.chunk_available = threading.Condition()
+        
+        # Latest analysis; readers take the reference and never see a partial update
+        empty_spectrum = np.zeros(NUM_FREQUENCY_BANDS)
+        empty_spectrum.flags.writeable = False
+        self.snapshot = SpectrumSnapshot(empty_spectrum, 0.0, time.monotonic(), 0)
         
         # Frequency band ranges (Hz)
         self.frequency_ranges = [
@@ -127,52 +180,27 @@ class AudioProcessor:
             (20000, 22050) # Air
         ]
         
+        self.build_analysis_plan(CHUNK_SIZE)
         self.init_audio()
     
     def init_audio(self):
-        """Initialize PyAudio for microphone input"""
-        try:
-            self.audio = pyaudio.PyAudio()
-            
-            # Find default input device
-            device_info = self.audio.get_default_input_device_info()
-            print(f"Using audio device: {device_info['name']}")
-            
-            # Open audio stream
-            self.stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=SAMPLE_RATE,
-                input=True,
-                frames_per_buffer=CHUNK_SIZE,
-                stream_callback=self.audio_callback
-            )
-            
+        """Open the audio source"""
+        self.available = self.source.open(self.audio_callback)
+        if self.available:
             print("Audio processor initialized successfully")
-            
-        except Exception as e:
-            print(f"Failed to initialize audio: {e}")
-            self.audio = None
-            self.stream = None
     
-    def audio_callback(self, in_data, frame_count, time_info, status):
-        """Audio stream callback for real-time processing"""
-        if status:
-            print(f"Audio callback status: {status}")
-        
-        # Convert bytes to numpy array
-        audio_data = np.frombuffer(in_data, dtype=np.int16)
-        
-        # Add to buffer
-        self.audio_buffer.append(audio_data)
-        
-        return (in_data, pyaudio.paContinue)
+    def audio_callback(self, audio_data: np.ndarray):
+        """Called by the audio source with each captured int16 chunk"""
+        # Hand the chunk to the processing thread
+        with self.chunk_available:
+            self.audio_buffer.append(audio_data)
+            self.chunk_available.notify()
     
     def start_audio_processing(self):
         """Start audio processing thread"""
-        if self.stream and not self.running:
+        if self.available and not self.running:
             self.running = True
-            self.stream.start_stream()
+            self.source.start()
             self.audio_thread = threading.Thread(target=self.process_audio_loop)
             self.audio_thread.daemon = True
             self.audio_thread.start()
@@ -180,77 +208,93 @@ class AudioProcessor:
     
     def stop_audio_processing(self):
         """Stop audio processing"""
-        self.running = False
-        if self.stream:
-            self.stream.stop_stream()
+        with self.chunk_available:
+            self.running = False
+            self.chunk_available.notify_all()
+        self.source.stop()
         if self.audio_thread:
             self.audio_thread.join()
         print("Audio processing stopped")
     
     def process_audio_loop(self):
-        """Main audio processing loop"""
-        while self.running:
-            if len(self.audio_buffer) > 0:
-                # Get latest audio chunk
-                audio_chunk = self.audio_buffer[-1]
-                
-                # Perform FFT analysis
-                self.analyze_frequency_bands(audio_chunk)
+        """Main audio processing loop, analyzing each captured chunk once as it arrives"""
+        while True:
+            with self.chunk_available:
+                while self.running and not self.audio_buffer:
+                    self.chunk_available.wait()
+                if not self.running:
+                    break
+                # Oldest pending chunk; the bounded buffer drops chunks if analysis falls behind
+                audio_chunk = self.audio_buffer.popleft()
             
-            time.sleep(0.01)  # Small delay to prevent excessive CPU usage
+            # Perform FFT analysis
+            self.analyze_frequency_bands(audio_chunk)
+    
+    def build_analysis_plan(self, chunk_size: int):
+        """Precompute the window, FFT bins and band boundaries for a chunk size"""
+        self.plan_chunk_size = chunk_size
+        self.window = np.hanning(chunk_size)
+        
+        # Positive-frequency bins, excluding Nyquist
+        self.num_bins = chunk_size // 2
+        freqs = np.fft.rfftfreq(chunk_size, 1/self.sample_rate)[:self.num_bins]
+        
+        # Each band spans the bins nearest its low and high frequency, inclusive.
+        # Adjacent bands share their edge bin, so band sums are taken as differences
+        # of one cumulative sum rather than with add.reduceat over disjoint slices.
+        self.band_starts = np.array([np.argmin(np.abs(freqs - low_freq)) for low_freq, _ in self.frequency_ranges])
+        self.band_stops = np.array([np.argmin(np.abs(freqs - high_freq)) + 1 for _, high_freq in self.frequency_ranges])
+        self.band_norms = 1.0 / ((self.band_stops - self.band_starts) * 32768.0)
+        self.magnitude_cumsum = np.zeros(self.num_bins + 1)
     
     def analyze_frequency_bands(self, audio_data):
         """Perform FFT analysis and extract frequency bands"""
         try:
-            # Apply window function to reduce spectral leakage
-            windowed_data = audio_data * np.hanning(len(audio_data))
+            if len(audio_data) != self.plan_chunk_size:
+                self.build_analysis_plan(len(audio_data))
             
-            # Perform FFT
-            fft_data = fft(windowed_data)
-            fft_magnitude = np.abs(fft_data[:len(fft_data)//2])
+            samples = audio_data.astype(np.float64)
             
-            # Get frequency bins
-            freqs = fftfreq(len(audio_data), 1/SAMPLE_RATE)[:len(fft_data)//2]
+            # Apply window function to reduce spectral leakage and take the real FFT
+            fft_magnitude = np.abs(np.fft.rfft(samples * self.window)[:self.num_bins])
             
             # Calculate overall audio level
-            self.latest_audio_level = np.sqrt(np.mean(audio_data**2)) / 32768.0
+            audio_level = float(np.sqrt(np.dot(samples, samples) / len(samples)) / 32768.0)
             
-            # Extract frequency bands
-            for i, (low_freq, high_freq) in enumerate(self.frequency_ranges):
-                # Find frequency bin indices
-                low_idx = np.argmin(np.abs(freqs - low_freq))
-                high_idx = np.argmin(np.abs(freqs - high_freq))
-                
-                # Calculate average magnitude for this band
-                band_magnitude = np.mean(fft_magnitude[low_idx:high_idx+1])
-                
-                # Normalize and apply smoothing
-                normalized_magnitude = band_magnitude / 32768.0
-                self.latest_frequency_data[i] = normalized_magnitude
+            # Average normalized magnitude of every band in one reduction
+            np.cumsum(fft_magnitude, out=self.magnitude_cumsum[1:])
+            spectrum = (self.magnitude_cumsum[self.band_stops] - self.magnitude_cumsum[self.band_starts]) * self.band_norms
             
-            # Calculate bass, mid, and high levels
-            self.latest_frequency_data[0] = np.mean(self.latest_frequency_data[0:2])  # Bass
-            self.latest_frequency_data[1] = np.mean(self.latest_frequency_data[2:4])  # Mid
-            self.latest_frequency_data[2] = np.mean(self.latest_frequency_data[4:6])  # High
+            # Calculate bass, mid, and high levels from band pairs (0-1, 2-3, 4-5)
+            spectrum[:3] = spectrum[:6].reshape(3, 2).mean(axis=1)
+            spectrum.flags.writeable = False
+            
+            # Publish the finished analysis with a single reference swap
+            self.snapshot = SpectrumSnapshot(spectrum, audio_level, time.monotonic(), self.snapshot.sequence + 1)
             
         except Exception as e:
             print(f"Error in frequency analysis: {e}")
     
+    def get_snapshot(self) -> SpectrumSnapshot:
+        """Get the latest complete frequency analysis"""
+        return self.snapshot
+    
     def get_frequency_data(self):
         """Get latest frequency analysis data"""
-        return self.latest_frequency_data.copy()
+        return self.snapshot.spectrum.tolist()
+    
+    def get_sequence(self) -> int:
+        """Get the number of chunks analyzed so far, to tell whether the data is fresh"""
+        return self.snapshot.sequence
     
     def get_audio_level(self):
         """Get latest audio level"""
-        return self.latest_audio_level
+        return self.snapshot.audio_level
     
     def cleanup(self):
         """Cleanup audio resources"""
         self.stop_audio_processing()
-        if self.stream:
-            self.stream.close()
-        if self.audio:
-            self.audio.terminate()
+        self.source.close()
 
 class EncoderHandler:
     """Handles KY-040 rotary encoder input for mode selection and brightness control"""
@@ -271,6 +315,8 @@ class EncoderHandler:
         self.pending_actions = []
         
         # Setup GPIO
+        global GPIO
+        import RPi.GPIO as GPIO
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(ENCODER_CLK_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         GPIO.setup(ENCODER_DT_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
@@ -365,33 +411,92 @@ class EncoderHandler:
         GPIO.cleanup()
 
 class LEDController:
-    def __init__(self):
-        self.state = AnimationState()
-        self.sockets = []
+    def __init__(self, encoder=None, audio_source=None, esp32_ips=None, num_leds_per_strip=None,
+                 chunked_framing=CHUNKED_FRAMING, delta_encoding=DELTA_ENCODING, compression=COMPRESSION,
+                 sync_latch=SYNC_LATCH, render_workers=RENDER_WORKERS, animation_cache=ANIMATION_CACHE,
+                 seed=None, static_frames=STATIC_FRAMES):
+        # Strip lengths, overridable e.g. for benchmarking
+        self.num_leds_per_strip = list(num_leds_per_strip) if num_leds_per_strip is not None else list(NUM_LEDS_PER_STRIP)
+        self.num_strips = len(self.num_leds_per_strip)
+        self.seed = seed  # Seeds the random modes for reproducible output; None draws fresh entropy
+        self.state = AnimationState(self.num_leds_per_strip, seed)
         self.running = False
-        self.strip_active = [True, True, True]  # All strips active by default
-        self.encoder = EncoderHandler()  # Initialize encoder handler
-        self.audio_processor = AudioProcessor()  # Initialize audio processor
+        self.strip_active = [True] * self.num_strips  # All strips active by default
+        # ESP32 addresses, overridable e.g. to point every strip at esp32_emulator.py
+        self.esp32_ips = list(esp32_ips) if esp32_ips is not None else list(ESP32_IPS)
+        self.encoder = encoder if encoder is not None else EncoderHandler()  # Initialize encoder handler
+        self.audio_processor = AudioProcessor(audio_source)  # Initialize audio processor
         self.music_mode_enabled = False  # Music mode boolean variable that toggles on button press/release
+        self.audio_sequence = -1  # Analysis sequence last copied into the animation state
+        self.scheduler = FrameScheduler(1 / SEND_INTERVAL, OVERRUN_POLICY)
         
-        # Initialize UDP sockets for each ESP32
-        for i, ip in enumerate(ESP32_IPS):
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                sock.settimeout(1.0)
-                self.sockets.append(sock)
-                print(f"Initialized socket for ESP32 #{i+1} at {ip}")
-            except Exception as e:
-                print(f"Failed to initialize socket for ESP32 #{i+1}: {e}")
-                self.sockets.append(None)
-
-    def rgb_to_bytes(self, r: int, g: int, b: int) -> bytes:
-        """Convert RGB values to bytes for transmission"""
-        return bytes([r, g, b])
-    
+        # Persistent per-strip packet buffer: [strip_index][brightness][RGB...]
+        # Each frame buffer is an (n_leds, 3) uint8 view over the packet's pixel region,
+        # so the modes render straight into the packet and sending copies nothing
+        self.packet_buffers = []
+        self.pixel_views = []
+        self.frame_buffers = []
+        for strip_index, count in enumerate(self.num_leds_per_strip):
+            packet = bytearray(PACKET_HEADER_SIZE + count * 3)
+            packet[0] = strip_index
+            pixel_view = memoryview(packet)[PACKET_HEADER_SIZE:]
+            self.packet_buffers.append(packet)
+            self.pixel_views.append(pixel_view)
+            self.frame_buffers.append(np.frombuffer(pixel_view, dtype=np.uint8).reshape(count, 3))
+        self.led_indices = [np.arange(count) for count in self.num_leds_per_strip]
+        self.frequency_weights = {}  # Frequency section weights cached per strip length
+        self.animation_cache = AnimationCache(ANIMATION_CACHE_BUDGET) if animation_cache else None
+        self.destinations = []
+        for ip in self.esp32_ips:
+            _, host, port, _ = parse_output_target(ip)
+            self.destinations.append((host, port or UDP_PORT))
+        
+        # Optional chunked framing: datagrams reference slices of the same pixel views.
+        # With the sync latch, frames are held by the ESP32s until flush_frame() sends OP_SHOW
+        self.chunked_framing = chunked_framing
+        self.sync_latch = sync_latch
+        self.show_latch = ShowLatch()
+        self.framers = [ChunkedFramer(strip_index, pixel_view, MAX_DATAGRAM_PAYLOAD, sync_latch)
+                        for strip_index, pixel_view in enumerate(self.pixel_views)]
+        
+        # Optional per-frame compression; frames too large for one datagram go out through the framers
+        self.compression = compression
+        # Only built when used: OP_CODED limits a strip to 65535 LEDs
+        self.codecs = [FrameCodec(framer, pixel_view, MAX_DATAGRAM_PAYLOAD) if compression else None
+                       for framer, pixel_view in zip(self.framers, self.pixel_views)]
+        
+        # Optional delta encoding against the last frame sent; keyframes are compressed when compression is on
+        self.delta_encoding = delta_encoding
+        self.delta_encoders = [DeltaEncoder(framer, pixel_view, KEYFRAME_INTERVAL, MAX_DATAGRAM_PAYLOAD, codec)
+                               for framer, pixel_view, codec in zip(self.framers, self.pixel_views, self.codecs)]
+        
+        # DDP/E1.31 drivers for strips whose entry names a standard protocol, None for the custom format
+        self.output_sync = SyncGroup(SYNC_OUTPUTS)
+        self.output_drivers = [create_output_driver(ip, pixel_view, self.output_sync)
+                               for ip, pixel_view in zip(self.esp32_ips, self.pixel_views)]
+        
+        # One non-blocking socket for every ESP32; each frame's datagrams are flushed together
+        self.transport = UDPTransport(BATCHED_SEND)
+        for i, ip in enumerate(self.esp32_ips):
+            print(f"Sending to ESP32 #{i+1} at {ip}")
+        print(f"UDP transport: {'sendmmsg batches' if self.transport.batched else 'one sendmsg per datagram'}")
+        
+        # Optional worker processes rendering into shared memory; frames are copied into the packets when sent
+        self.render_pool = (RenderPool(self.num_leds_per_strip, render_workers, animation_cache, seed)
+                            if render_workers > 0 else None)
+        if self.render_pool:
+            print(f"Rendering {self.num_strips} strips in {self.render_pool.workers} worker processes")
+        self.recorder = None  # FrameRecorder capturing every rendered frame, see start_recording()
+        
+        # Static frames are rendered once, then reused and resent every KEEPALIVE_INTERVAL until their key changes
+        self.static_frames = static_frames
+        self.static_keys = [None] * self.num_strips  # Key of each strip's last frame, None if it was not static
+        self.unchanged_strips = [False] * self.num_strips  # Strips whose last render_frame() reused the previous frame
+        self.next_keepalive = [0] * self.num_strips  # Monotonic time (ns) after which an unchanged frame is resent
+
     def get_frequency_sections(self, strip_index: int) -> dict:
         """Calculate LED ranges for each frequency section based on strip length"""
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
+        led_count = self.num_leds_per_strip[strip_index]
         
         sections = {}
         for key, percentage in FREQUENCY_SECTION_PERCENTAGES.items():
@@ -399,426 +504,328 @@ class LEDController:
         
         return sections
     
-    def get_frequency_brightness(self, strip_index: int, led_index: int) -> float:
-        """Calculate brightness for a specific LED with feathering between frequency sections"""
+    def update_audio_state(self) -> bool:
+        """Copy the latest audio analysis into the animation state if it is new"""
+        snapshot = self.audio_processor.get_snapshot()
+        if snapshot.sequence == self.audio_sequence:
+            return False
+        self.audio_sequence = snapshot.sequence
+        
+        frequency_data = snapshot.spectrum
+        self.state.frequency_bands = frequency_data
+        self.state.audio_level = snapshot.audio_level
+        self.state.bass_level = float(frequency_data[0]) if len(frequency_data) > 0 else 0.0
+        self.state.mid_level = float(frequency_data[1]) if len(frequency_data) > 1 else 0.0
+        self.state.high_level = float(frequency_data[2]) if len(frequency_data) > 2 else 0.0
+        return True
+    
+    def get_frequency_weights(self, strip_index: int) -> np.ndarray:
+        """Get the cached (3, n_leds) high/mid/bass weight vectors for a strip"""
+        led_count = self.num_leds_per_strip[strip_index]
+        weights = self.frequency_weights.get(led_count)
+        if weights is None:
+            weights = self.build_frequency_weights(strip_index)
+            weights.flags.writeable = False
+            self.frequency_weights[led_count] = weights
+        return weights
+    
+    def build_frequency_weights(self, strip_index: int) -> np.ndarray:
+        """Build per-LED weights of the high, mid and bass levels, feathering included"""
         sections = self.get_frequency_sections(strip_index)
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
+        led_count = self.num_leds_per_strip[strip_index]
+        led_index = np.arange(led_count)
+        high, mid, bass = 0, 1, 2
         
         # Define feathering zone size (5% of total LEDs)
         feather_zone = max(1, int(led_count * 0.05))
         
-        # Determine which frequency section this LED primarily belongs to
-        if led_index < sections['high_end'] or led_index >= sections['high2_start']:
-            primary_frequency = 'high'
-            primary_level = self.state.high_level
-        elif led_index < sections['mid_end'] or (led_index >= sections['mid2_start'] and led_index < sections['mid2_end']):
-            primary_frequency = 'mid'
-            primary_level = self.state.mid_level
-        else:
-            primary_frequency = 'bass'
-            primary_level = self.state.bass_level
-        
-        # Calculate base brightness
-        base_brightness = 0.3
-        brightness = base_brightness + (primary_level * 0.7)
-        
-        # Apply feathering at section boundaries
-        if led_index >= sections['high_end'] - feather_zone and led_index < sections['high_end'] + feather_zone:
-            # Transition between high and mid (first boundary)
-            distance = led_index - (sections['high_end'] - feather_zone)
-            feather_factor = distance / (feather_zone * 2)
-            mid_brightness = base_brightness + (self.state.mid_level * 0.7)
-            brightness = brightness * (1 - feather_factor) + mid_brightness * feather_factor
-            
-        elif led_index >= sections['mid_end'] - feather_zone and led_index < sections['mid_end'] + feather_zone:
-            # Transition between mid and bass (second boundary)
-            distance = led_index - (sections['mid_end'] - feather_zone)
-            feather_factor = distance / (feather_zone * 2)
-            bass_brightness = base_brightness + (self.state.bass_level * 0.7)
-            brightness = brightness * (1 - feather_factor) + bass_brightness * feather_factor
-            
-        elif led_index >= sections['bass_end'] - feather_zone and led_index < sections['bass_end'] + feather_zone:
-            # Transition between bass and mid (third boundary)
-            distance = led_index - (sections['bass_end'] - feather_zone)
-            feather_factor = distance / (feather_zone * 2)
-            mid_brightness = base_brightness + (self.state.mid_level * 0.7)
-            brightness = brightness * (1 - feather_factor) + mid_brightness * feather_factor
-            
-        elif led_index >= sections['mid2_end'] - feather_zone and led_index < sections['mid2_end'] + feather_zone:
-            # Transition between mid and high (fourth boundary)
-            distance = led_index - (sections['mid2_end'] - feather_zone)
-            feather_factor = distance / (feather_zone * 2)
-            high_brightness = base_brightness + (self.state.high_level * 0.7)
-            brightness = brightness * (1 - feather_factor) + high_brightness * feather_factor
-        
-        return min(1.0, brightness)
-
-    def hsv_to_rgb(self, h: float, s: float, v: float) -> Tuple[int, int, int]:
-        """Convert HSV to RGB"""
-        h = h % 360
-        c = v * s
-        x = c * (1 - abs((h / 60) % 2 - 1))
-        m = v - c
-        
-        if 0 <= h < 60:
-            r, g, b = c, x, 0
-        elif 60 <= h < 120:
-            r, g, b = x, c, 0
-        elif 120 <= h < 180:
-            r, g, b = 0, c, x
-        elif 180 <= h < 240:
-            r, g, b = 0, x, c
-        elif 240 <= h < 300:
-            r, g, b = x, 0, c
-        else:
-            r, g, b = c, 0, x
-            
-        return (int((r + m) * 255), int((g + m) * 255), int((b + m) * 255))
+        # Determine which frequency section each LED primarily belongs to
+        is_high = (led_index < sections['high_end']) | (led_index >= sections['high2_start'])
+        is_mid = (led_index < sections['mid_end']) | ((led_index >= sections['mid2_start']) & (led_index < sections['mid2_end']))
+        primary = np.where(is_high, high, np.where(is_mid, mid, bass))
+        
+        weights = np.zeros((3, led_count))
+        weights[primary, led_index] = 1.0
+        
+        # Feather towards the neighbouring section at each boundary; the first matching boundary wins
+        unfeathered = np.ones(led_count, dtype=bool)
+        for boundary, target in (('high_end', mid), ('mid_end', bass), ('bass_end', mid), ('mid2_end', high)):
+            zone_start = sections[boundary] - feather_zone
+            in_zone = unfeathered & (led_index >= zone_start) & (led_index < sections[boundary] + feather_zone)
+            feather_factor = (led_index[in_zone] - zone_start) / (feather_zone * 2)
+            weights[:, in_zone] *= 1 - feather_factor
+            weights[target, in_zone] += feather_factor
+            unfeathered &= ~in_zone
+        
+        return weights
+    
+    def get_frequency_brightness_array(self, strip_index: int) -> np.ndarray:
+        """Feathered brightness of every LED: a weighted sum of the high, mid and bass levels"""
+        levels = np.array([self.state.high_level, self.state.mid_level, self.state.bass_level])
+        brightness = levels @ self.get_frequency_weights(strip_index)
+        brightness *= 0.7
+        brightness += 0.3  # Base brightness
+        return np.minimum(1.0, brightness, out=brightness)
 
-    def mode_white(self, strip_index: int) -> List[bytes]:
+    def mode_white(self, strip_index: int) -> np.ndarray:
         """White mode, optionally music reactive"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
+        pixels = self.frame_buffers[strip_index]
         
         if self.music_mode_enabled:
             # Music reactive white mode with frequency sections and feathering
-            frequency_data = self.audio_processor.get_frequency_data()
-            audio_level = self.audio_processor.get_audio_level()
+            self.update_audio_state()
             
-            # Update state with latest audio data
-            self.state.frequency_bands = frequency_data
-            self.state.audio_level = audio_level
-            self.state.bass_level = frequency_data[0] if len(frequency_data) > 0 else 0.0
-            self.state.mid_level = frequency_data[1] if len(frequency_data) > 1 else 0.0
-            self.state.high_level = frequency_data[2] if len(frequency_data) > 2 else 0.0
-            
-            for i in range(led_count):
-                # Get feathered brightness for this LED
-                brightness = self.get_frequency_brightness(strip_index, i)
-                brightness_value = int(255 * brightness)
-                
-                pixels.append(self.rgb_to_bytes(brightness_value, brightness_value, brightness_value))
+            # Feathered brightness for every LED
+            brightness = self.get_frequency_brightness_array(strip_index)
+            pixels[:] = (255 * brightness)[:, np.newaxis]
         else:
             # Normal white mode
-            for i in range(led_count):
-                pixels.append(self.rgb_to_bytes(255, 255, 255))
+            pixels[:] = 255
         
         return pixels
 
-    def mode_solid_color(self, strip_index: int) -> List[bytes]:
+    def mode_solid_color(self, strip_index: int) -> np.ndarray:
         """Solid color mode with cycling hue, optionally music reactive"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
+        pixels = self.frame_buffers[strip_index]
         
         if self.music_mode_enabled:
             # Music reactive solid color mode with frequency sections and feathering
-            frequency_data = self.audio_processor.get_frequency_data()
-            audio_level = self.audio_processor.get_audio_level()
-            
-            # Update state with latest audio data
-            self.state.frequency_bands = frequency_data
-            self.state.audio_level = audio_level
-            self.state.bass_level = frequency_data[0] if len(frequency_data) > 0 else 0.0
-            self.state.mid_level = frequency_data[1] if len(frequency_data) > 1 else 0.0
-            self.state.high_level = frequency_data[2] if len(frequency_data) > 2 else 0.0
+            self.update_audio_state()
             
             # Get base color from current hue
-            r_base, g_base, b_base = self.hsv_to_rgb(self.state.hue, 1.0, 1.0)
+            base_color = hsv_lut(self.state.hue, 255)
             
-            for i in range(led_count):
-                # Get feathered brightness for this LED
-                brightness = self.get_frequency_brightness(strip_index, i)
-                
-                # Apply brightness to base color
-                r = int(r_base * brightness)
-                g = int(g_base * brightness)
-                b = int(b_base * brightness)
-                
-                pixels.append(self.rgb_to_bytes(r, g, b))
+            # Apply feathered brightness to base color
+            brightness = self.get_frequency_brightness_array(strip_index)
+            pixels[:] = np.multiply.outer(brightness, base_color)
         else:
             # Normal solid color mode
-            r, g, b = self.hsv_to_rgb(self.state.hue, 1.0, 1.0)
-            for i in range(led_count):
-                pixels.append(self.rgb_to_bytes(r, g, b))
+            pixels[:] = hsv_lut(self.state.hue, 255)
         
         return pixels
 
-    def mode_rainbow(self, strip_index: int) -> List[bytes]:
-        """Rainbow mode"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
-        for i in range(led_count):
-            hue = (self.state.hue + i * 360 / led_count) % 360
-            r, g, b = self.hsv_to_rgb(hue, 1.0, 1.0)
-            pixels.append(self.rgb_to_bytes(r, g, b))
+    def get_cached_frame(self, strip_index: int, key: tuple, period: int, index: int, render) -> np.ndarray:
+        """Frame from the animation cache, or render(index, out) straight into the strip when it is off or full
+
+        Only modes registered as cacheable use the cache.
+        """
+        pixels = self.frame_buffers[strip_index]
+        if self.animation_cache and MODE_REGISTRY.get(self.state.current_mode).cacheable:
+            led_count = self.num_leds_per_strip[strip_index]
+            frame = self.animation_cache.get(key + (led_count,), led_count, period, index, render)
+            if frame is not None:
+                pixels[:] = frame
+                return pixels
+        render(index, pixels)
         return pixels
 
-    def mode_fire(self, strip_index: int) -> List[bytes]:
+    def mode_rainbow(self, strip_index: int) -> np.ndarray:
+        """Rainbow mode"""
+        return self.get_cached_frame(strip_index, (LEDModes.RAINBOW,), LUT_HUES, self.state.hue % LUT_HUES,
+                                     lambda hue, out: self.render_rainbow(strip_index, hue, out))
+
+    def render_rainbow(self, strip_index: int, hue: int, out: np.ndarray) -> np.ndarray:
+        led_count = self.num_leds_per_strip[strip_index]
+        hue = (hue + self.led_indices[strip_index] * 360 / led_count) % 360
+        return hsv_to_rgb_array(hue, 1.0, 1.0, out=out)
+
+    def mode_fire(self, strip_index: int) -> np.ndarray:
         """Fire animation mode"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
-        
-        # Cool down every cell
-        for i in range(led_count):
-            self.state.fire_heat[strip_index][i] = max(0, self.state.fire_heat[strip_index][i] - random.randint(0, 2))
-        
-        # Heat diffusion
-        new_heat = [0] * led_count
-        for i in range(led_count):
-            left_heat = self.state.fire_heat[strip_index][i-1] if i > 0 else 0
-            right_heat = self.state.fire_heat[strip_index][i+1] if i < led_count-1 else 0
-            current_heat = self.state.fire_heat[strip_index][i]
-            new_heat[i] = (left_heat + current_heat + right_heat) // 3
-            
-            # Add randomness
-            if random.randint(0, 255) < 50:
-                new_heat[i] = min(255, new_heat[i] + random.randint(0, 10))
-        
-        self.state.fire_heat[strip_index] = new_heat
-        
-        # Add sparks
-        if random.randint(0, 255) < 120:
-            spark_pos = random.randint(0, led_count-1)
-            self.state.fire_heat[strip_index][spark_pos] = min(255, self.state.fire_heat[strip_index][spark_pos] + random.randint(160, 255))
-        
-        # Convert heat to colors
-        for i in range(led_count):
-            heat = self.state.fire_heat[strip_index][i]
-            if heat < 85:
-                r = heat * 3
-                g = 0
-                b = 0
-            elif heat < 170:
-                r = 255
-                g = (heat - 85) * 3
-                b = 0
-            else:
-                r = 255
-                g = 255
-                b = (heat - 170) * 3
-            
-            pixels.append(self.rgb_to_bytes(int(r), int(g), int(b)))
-        
-        return pixels
+        return self.state.fire[strip_index].step(self.frame_buffers[strip_index])
 
-    def mode_aurora(self, strip_index: int) -> List[bytes]:
+    def mode_aurora(self, strip_index: int) -> np.ndarray:
         """Aurora borealis animation"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
-        
-        for i in range(led_count):
-            # Create wave patterns
-            wave1 = int(127 * (1 + math.sin((self.state.aurora_phase + i * 2) * math.pi / 128)))
-            wave2 = int(127 * (1 + math.sin((self.state.aurora_phase * 0.6 + i * 3) * math.pi / 128)))
-            wave3 = int(127 * (1 + math.sin((self.state.aurora_phase * 0.3 + i * 1) * math.pi / 128)))
-            
-            combined_wave = (wave1 * 2 + wave2 + wave3) // 4
-            self.state.aurora_intensity[strip_index][i] = combined_wave
-            
-            # Aurora colors (green, purple, pink)
-            aurora_colors = [(96, 200, 120), (192, 100, 200), (224, 100, 150)]
-            color_position = combined_wave / 255.0
-            color_index = int(color_position * (len(aurora_colors) - 1))
-            
-            if color_index < len(aurora_colors) - 1:
-                blend_factor = color_position * (len(aurora_colors) - 1) - color_index
-                c1 = aurora_colors[color_index]
-                c2 = aurora_colors[color_index + 1]
-                r = int(c1[0] + (c2[0] - c1[0]) * blend_factor)
-                g = int(c1[1] + (c2[1] - c1[1]) * blend_factor)
-                b = int(c1[2] + (c2[2] - c1[2]) * blend_factor)
-            else:
-                r, g, b = aurora_colors[color_index]
-            
-            # Add variation
-            r += random.randint(-12, 12)
-            g += random.randint(-12, 12)
-            b += random.randint(-12, 12)
-            
-            r = max(0, min(255, r))
-            g = max(0, min(255, g))
-            b = max(0, min(255, b))
-            
-            pixels.append(self.rgb_to_bytes(r, g, b))
+        pixels = self.frame_buffers[strip_index]
+        engine = self.state.aurora[strip_index]
         
-        return pixels
+        # Wave-blended base colors depend only on the phase, so they can come from the cache
+        base = self.get_cached_frame(strip_index, (LEDModes.AURORA,), AURORA_PHASE_PERIOD,
+                                     self.state.aurora_phase % AURORA_PHASE_PERIOD, engine.render_base)
+        return engine.add_variation(base, pixels)
 
-    def mode_twinkle(self, strip_index: int) -> List[bytes]:
+    def mode_twinkle(self, strip_index: int) -> np.ndarray:
         """Twinkle animation"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
-        
-        for i in range(led_count):
-            if random.randint(0, 255) < 20:
-                self.state.twinkle_state[strip_index][i] = random.randint(0, 255)
-                hue = random.randint(0, 360)
-                r, g, b = self.hsv_to_rgb(hue, 1.0, 1.0)
-                pixels.append(self.rgb_to_bytes(r, g, b))
-            else:
-                # Fade existing twinkles
-                if self.state.twinkle_state[strip_index][i] > 0:
-                    self.state.twinkle_state[strip_index][i] = max(0, self.state.twinkle_state[strip_index][i] - 20)
-                    brightness = self.state.twinkle_state[strip_index][i] / 255.0
-                    r, g, b = self.hsv_to_rgb(0, 0, brightness)
-                    pixels.append(self.rgb_to_bytes(int(r), int(g), int(b)))
-                else:
-                    pixels.append(self.rgb_to_bytes(0, 0, 0))
-        
-        return pixels
+        return self.state.twinkle[strip_index].step(self.frame_buffers[strip_index])
 
-    def mode_wave(self, strip_index: int) -> List[bytes]:
+    def mode_wave(self, strip_index: int) -> np.ndarray:
         """Wave animation"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
-        
-        for i in range(led_count):
-            wave = int(127 * (1 + math.sin((self.state.animation_step + i * 8) * math.pi / 128)))
-            hue = (self.state.hue + i * 2) % 360
-            r, g, b = self.hsv_to_rgb(hue, 1.0, wave / 255.0)
-            pixels.append(self.rgb_to_bytes(r, g, b))
-        
-        return pixels
+        # Not cached: hue and the 256-step sine only line up again after lcm(360, 256) frames, about 10 minutes
+        return self.render_wave(strip_index, self.state.animation_step, self.state.hue, self.frame_buffers[strip_index])
 
-    def mode_chase(self, strip_index: int) -> List[bytes]:
+    def render_wave(self, strip_index: int, step: int, hue: int, out: np.ndarray) -> np.ndarray:
+        i = self.led_indices[strip_index]
+        wave = (127 * (1 + np.sin((step + i * 8) * math.pi / 128))).astype(np.int32)
+        hue = (hue + i * 2) % 360
+        return hsv_lut(hue, wave, out=out)
+
+    def mode_chase(self, strip_index: int) -> np.ndarray:
         """Chase animation"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
-        
-        for i in range(led_count):
-            pos = (self.state.animation_step // 2) % led_count
-            if i == pos:
-                r, g, b = self.hsv_to_rgb(self.state.hue, 1.0, 1.0)
-                pixels.append(self.rgb_to_bytes(r, g, b))
-            elif i == (pos + 1) % led_count:
-                r, g, b = self.hsv_to_rgb(self.state.hue, 1.0, 0.5)
-                pixels.append(self.rgb_to_bytes(r, g, b))
-            elif i == (pos + 2) % led_count:
-                r, g, b = self.hsv_to_rgb(self.state.hue, 1.0, 0.25)
-                pixels.append(self.rgb_to_bytes(r, g, b))
-            else:
-                pixels.append(self.rgb_to_bytes(0, 0, 0))
+        pixels = self.frame_buffers[strip_index]
+        led_count = self.num_leds_per_strip[strip_index]
+        pos = (self.state.animation_step // 2) % led_count
+        
+        # Tail first so the head wins where positions overlap on very short strips
+        pixels[:] = 0
+        pixels[(pos + 2) % led_count] = hsv_to_rgb(self.state.hue, 1.0, 0.25)
+        pixels[(pos + 1) % led_count] = hsv_to_rgb(self.state.hue, 1.0, 0.5)
+        pixels[pos] = hsv_lut(self.state.hue, 255)
         
         return pixels
 
-    def mode_breathing(self, strip_index: int) -> List[bytes]:
+    def mode_breathing(self, strip_index: int) -> np.ndarray:
         """Breathing animation"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
-        
+        pixels = self.frame_buffers[strip_index]
         breath = int(127 * (1 + math.sin(self.state.animation_step * math.pi / 128)))
-        r, g, b = self.hsv_to_rgb(self.state.hue, 1.0, breath / 255.0)
-        
-        for i in range(led_count):
-            pixels.append(self.rgb_to_bytes(r, g, b))
-        
+        pixels[:] = hsv_lut(self.state.hue, breath)
         return pixels
 
-    def mode_color_reactive(self, strip_index: int, r_base: int, g_base: int, b_base: int) -> List[bytes]:
+    def mode_color_reactive(self, strip_index: int, r_base: int, g_base: int, b_base: int) -> np.ndarray:
         """Color mode that reacts to music when enabled"""
-        pixels = []
-        led_count = NUM_LEDS_PER_STRIP[strip_index]
+        pixels = self.frame_buffers[strip_index]
         
         if self.music_mode_enabled:
             # Music reactive color mode with frequency sections and feathering
-            frequency_data = self.audio_processor.get_frequency_data()
-            audio_level = self.audio_processor.get_audio_level()
+            self.update_audio_state()
             
-            # Update state with latest audio data
-            self.state.frequency_bands = frequency_data
-            self.state.audio_level = audio_level
-            self.state.bass_level = frequency_data[0] if len(frequency_data) > 0 else 0.0
-            self.state.mid_level = frequency_data[1] if len(frequency_data) > 1 else 0.0
-            self.state.high_level = frequency_data[2] if len(frequency_data) > 2 else 0.0
-            
-            for i in range(led_count):
-                # Get feathered brightness for this LED
-                brightness = self.get_frequency_brightness(strip_index, i)
-                
-                # Apply brightness to base color
-                r = int(r_base * brightness)
-                g = int(g_base * brightness)
-                b = int(b_base * brightness)
-                
-                pixels.append(self.rgb_to_bytes(r, g, b))
+            # Apply feathered brightness to base color
+            brightness = self.get_frequency_brightness_array(strip_index)
+            pixels[:] = np.multiply.outer(brightness, (r_base, g_base, b_base))
         else:
             # Normal color mode
-            for i in range(led_count):
-                pixels.append(self.rgb_to_bytes(r_base, g_base, b_base))
+            pixels[:] = (r_base, g_base, b_base)
         
         return pixels
 
-    def calculate_led_data(self, strip_index: int) -> List[bytes]:
-        """Calculate LED data for a specific strip"""
+    def calculate_led_data(self, strip_index: int) -> np.ndarray:
+        """Calculate LED data for a specific strip as an (n_leds, 3) uint8 array"""
         if not self.strip_active[strip_index]:
-            return [self.rgb_to_bytes(0, 0, 0) for _ in range(NUM_LEDS_PER_STRIP[strip_index])]
-        
-        mode = self.state.current_mode
-        
-        if mode == LEDModes.WHITE:
-            return self.mode_white(strip_index)
-        elif mode == LEDModes.RED:
-            return self.mode_color_reactive(strip_index, 255, 0, 0)  # Red
-        elif mode == LEDModes.YELLOW:
-            return self.mode_color_reactive(strip_index, 255, 255, 0)  # Yellow
-        elif mode == LEDModes.GREEN:
-            return self.mode_color_reactive(strip_index, 0, 255, 0)  # Green
-        elif mode == LEDModes.CYAN:
-            return self.mode_color_reactive(strip_index, 0, 255, 255)  # Cyan
-        elif mode == LEDModes.BLUE:
-            return self.mode_color_reactive(strip_index, 0, 0, 255)  # Blue
-        elif mode == LEDModes.MAGENTA:
-            return self.mode_color_reactive(strip_index, 255, 0, 255)  # Magenta
-        elif mode == LEDModes.SOLID_COLOR:
-            return self.mode_solid_color(strip_index)
-        elif mode == LEDModes.RAINBOW:
-            return self.mode_rainbow(strip_index)
-        elif mode == LEDModes.FIRE:
-            return self.mode_fire(strip_index)
-        elif mode == LEDModes.AURORA:
-            return self.mode_aurora(strip_index)
-        elif mode == LEDModes.TWINKLE:
-            return self.mode_twinkle(strip_index)
-        elif mode == LEDModes.WAVE:
-            return self.mode_wave(strip_index)
-        elif mode == LEDModes.CHASE:
-            return self.mode_chase(strip_index)
-        elif mode == LEDModes.BREATHING:
-            return self.mode_breathing(strip_index)
-        else:
-            return self.mode_white(strip_index)
+            pixels = self.frame_buffers[strip_index]
+            pixels[:] = 0
+            return pixels
+        
+        # Unknown mode ids render the registry's default (white)
+        return MODE_REGISTRY.get(self.state.current_mode).render(self, strip_index)
 
-    def send_data_to_esp32(self, strip_index: int, led_data: List[bytes]):
-        """Send LED data to specific ESP32"""
-        if strip_index >= len(self.sockets) or self.sockets[strip_index] is None:
+    def get_static_key(self, strip_index: int) -> Optional[tuple]:
+        """Everything a static frame depends on, or None if the strip's frame may change from frame to frame"""
+        led_count = self.num_leds_per_strip[strip_index]
+        if not self.strip_active[strip_index]:
+            return (None, self.state.brightness, led_count)
+        mode = MODE_REGISTRY.get(self.state.current_mode)
+        if not mode.static or self.music_mode_enabled:
+            return None
+        return (mode.mode_id, self.state.brightness, self.state.hue, led_count)
+
+    def update_static_keys(self) -> list:
+        """Record each strip's static key for this frame; returns which strips can reuse their last frame"""
+        if not self.static_frames:
+            return self.unchanged_strips
+        keys = [self.get_static_key(strip_index) for strip_index in range(self.num_strips)]
+        self.unchanged_strips = [key is not None and key == last for key, last in zip(keys, self.static_keys)]
+        self.static_keys = keys
+        return self.unchanged_strips
+
+    def render_frame(self) -> list:
+        """Calculate LED data for every strip, in the render workers when enabled
+
+        Strips with an unchanged static frame are not rendered again; their last frame is returned.
+        """
+        unchanged = self.update_static_keys()
+        if self.render_pool and all(unchanged):
+            return self.render_pool.frames  # The workers' last frames, still in shared memory
+        if self.render_pool:
+            # Workers get the audio levels with the rest of the state instead of reading the processor
+            if self.music_mode_enabled:
+                self.update_audio_state()
+            frames = self.render_pool.render(self.state, self.strip_active, self.music_mode_enabled)
+            if frames is not None:
+                return frames
+            print(f"{self.render_pool.error}\nRendering in the animation thread from now on")
+            self.render_pool.close()
+            self.render_pool = None
+        # Every frame sent was copied into the packet, so the frame buffers hold the last one
+        return [self.frame_buffers[strip_index] if unchanged[strip_index] else self.calculate_led_data(strip_index)
+                for strip_index in range(self.num_strips)]
+
+    def frame_due(self, strip_index: int, now: int) -> bool:
+        """Whether to send a strip's frame: unchanged static frames only go out as keepalives"""
+        if self.unchanged_strips[strip_index]:
+            if now < self.next_keepalive[strip_index]:
+                return False
+            # Delta encoding would send nothing for an unchanged frame; a keepalive resends all of it
+            self.delta_encoders[strip_index].reset()
+        self.next_keepalive[strip_index] = now + int(KEEPALIVE_INTERVAL * 1e9)
+        return True
+
+    def send_data_to_esp32(self, strip_index: int, led_data: np.ndarray):
+        """Queue LED data for a specific ESP32; flush_frame() sends every strip's datagrams together"""
+        if strip_index >= len(self.destinations):
             return False
         
         try:
-            # Create packet: [strip_index, brightness, led_data...]
-            packet = bytearray()
-            packet.append(strip_index)
-            packet.append(self.state.brightness)
+            # Frames rendered by calculate_led_data already live in the packet
+            if led_data is not self.frame_buffers[strip_index]:
+                self.frame_buffers[strip_index][:] = led_data
+            
+            destination = self.destinations[strip_index]
+            driver = self.output_drivers[strip_index]
+            
+            if driver:
+                # DDP/E1.31: brightness is applied to the pixels, destinations may differ per universe
+                for driver_destination, datagram in driver.datagrams(self.state.brightness):
+                    self.transport.queue(strip_index, driver_destination, datagram)
+                return True
             
-            for pixel in led_data:
-                packet.extend(pixel)
+            if self.delta_encoding:
+                # Nothing for an unchanged frame, else a fill, changed ranges or a periodic keyframe
+                datagrams = self.delta_encoders[strip_index].encode(self.state.brightness)
+            elif self.compression:
+                # Smallest of RLE, palette and raw in one datagram, or chunks if none fits
+                datagrams = self.codecs[strip_index].encode(self.state.brightness)
+            elif self.chunked_framing or self.sync_latch:
+                # One (header, pixel slice) datagram per chunk; the last one tells the ESP32 to show or hold
+                datagrams = self.framers[strip_index].next_frame(self.state.brightness)
+            else:
+                # Packet: [strip_index, brightness, led_data...], header written in place
+                packet = self.packet_buffers[strip_index]
+                packet[1] = self.state.brightness
+                datagrams = [(packet,)]
             
-            # Send to ESP32
-            self.sockets[strip_index].sendto(packet, (ESP32_IPS[strip_index], UDP_PORT))
+            for datagram in datagrams:
+                self.transport.queue(strip_index, destination, datagram)
             return True
         except Exception as e:
             print(f"Failed to send data to ESP32 #{strip_index + 1}: {e}")
             return False
 
+    def flush_frame(self) -> int:
+        """Send the datagrams queued for every strip in one batch; send errors are counted, not raised"""
+        # Latch packets go last so synchronized receivers show the frame together
+        for destination, datagram in self.output_sync.datagrams():
+            self.transport.queue("sync", destination, datagram)
+        if self.sync_latch:
+            show = self.show_latch.next_show()
+            for destination in self.get_latch_destinations():
+                self.transport.queue("show", destination, show)
+        return self.transport.flush()
+
+    def get_latch_destinations(self) -> list:
+        """Where OP_SHOW goes: the broadcast address, or every ESP32 using the custom format"""
+        if LATCH_BROADCAST_ADDRESS:
+            return [(LATCH_BROADCAST_ADDRESS, UDP_PORT)]
+        destinations = []
+        for destination, driver in zip(self.destinations, self.output_drivers):
+            if driver is None and destination not in destinations:
+                destinations.append(destination)
+        return destinations
+
     def update_animation_state(self):
         """Update animation state variables"""
         self.state.animation_step += 1
         
-        # Update hue for color cycling
-        if self.state.current_mode in [LEDModes.SOLID_COLOR, LEDModes.RAINBOW, LEDModes.WAVE, LEDModes.CHASE, LEDModes.BREATHING]:
-            self.state.hue = (self.state.hue + 1) % 360
-        
-        # Update aurora phase
-        if self.state.current_mode == LEDModes.AURORA:
-            self.state.aurora_phase = (self.state.aurora_phase + 1) % 1000
+        # Hue for color cycling, aurora phase, ... as declared by the current mode
+        for counter in MODE_REGISTRY.get(self.state.current_mode).advances:
+            setattr(self.state, counter, (getattr(self.state, counter) + 1) % COUNTER_PERIODS[counter])
 
     def run_animation_loop(self):
         """Main animation loop"""
@@ -826,33 +833,62 @@ class LEDController:
         self.running = True
         
         while self.running:
-            start_time = time.time()
+            frame_start = self.scheduler.wait_for_frame()
             
             # Handle encoder input
             self.handle_encoder_input()
             
-            # Calculate and send data for each strip
-            for strip_index in range(NUM_STRIPS):
-                led_data = self.calculate_led_data(strip_index)
-                self.send_data_to_esp32(strip_index, led_data)
+            # Calculate and queue data for each strip, then send all strips back to back
+            frames = self.render_frame()
+            if self.recorder:
+                self.recorder.write(frame_start, self.state.brightness, frames)
+            due = [strip_index for strip_index in range(len(frames)) if self.frame_due(strip_index, frame_start)]
+            for strip_index in due:
+                self.send_data_to_esp32(strip_index, frames[strip_index])
+            if due:
+                self.flush_frame()
             
             # Update animation state
             self.update_animation_state()
             
-            # Maintain frame rate
-            elapsed = time.time() - start_time
-            sleep_time = max(0, SEND_INTERVAL - elapsed)
-            time.sleep(sleep_time)
+            # Record frame time and advance to the next deadline
+            self.scheduler.frame_done(frame_start)
+
+    def run_replay_loop(self, replay, loop: bool = False):
+        """Send a recording's frames at their recorded times without running any mode code"""
+        print(f"Replaying {replay.frame_count} frames ({replay.duration_ns / 1e9:.1f} s) from {replay.path}...")
+        self.running = True
+        start = time.monotonic_ns()
+        
+        while self.running and replay.frame_count:
+            for index in range(replay.frame_count):
+                if not self.running:
+                    break
+                frame_start = self.scheduler.wait_until(start + int(replay.timestamps[index]))
+                
+                # Recorded frames go through the same encoding and transport as rendered ones
+                brightness, frames = replay.frame(index)
+                self.state.brightness = brightness
+                for strip_index, led_data in enumerate(frames):
+                    self.send_data_to_esp32(strip_index, led_data)
+                self.flush_frame()
+                self.scheduler.frame_done(frame_start)
+            if not loop:
+                break
+            start += replay.duration_ns + replay.frame_interval_ns
+        
+        self.running = False
+        print("Replay finished")
 
     def handle_encoder_input(self):
         """Handle encoder input for mode selection and brightness control"""
         action = self.encoder.get_encoder_action()
         
         if action == "mode_up":
-            self.state.current_mode = (self.state.current_mode + 1) % 17  # Exclude music mode from cycling
+            self.state.current_mode = MODE_REGISTRY.cycle(self.state.current_mode, 1)
             print(f"Mode changed to: {self.state.current_mode}")
         elif action == "mode_down":
-            self.state.current_mode = (self.state.current_mode - 1) % 17  # Exclude music mode from cycling
+            self.state.current_mode = MODE_REGISTRY.cycle(self.state.current_mode, -1)
             print(f"Mode changed to: {self.state.current_mode}")
         elif action == "brightness_up":
             self.state.brightness = min(255, self.state.brightness + 12)
@@ -866,6 +902,19 @@ class LEDController:
             # Button press functionality can be added here if needed
             print("Encoder button pressed")
 
+    def start_recording(self, path: str):
+        """Record every frame rendered from now on to a file that can be replayed with --replay"""
+        self.stop_recording()
+        self.recorder = FrameRecorder(path, self.num_leds_per_strip, self.scheduler.fps)
+        print(f"Recording frames to {path}")
+
+    def stop_recording(self):
+        """Close the current recording, if any"""
+        recorder, self.recorder = self.recorder, None
+        if recorder:
+            recorder.close()
+            print(f"Recorded {recorder.frame_count} frames to {recorder.path}")
+
     def set_mode(self, mode: int):
         """Set LED mode"""
         self.state.current_mode = mode
@@ -876,9 +925,19 @@ class LEDController:
         self.state.brightness = max(0, min(255, brightness))
         print(f"Brightness set to: {self.state.brightness}")
 
+    def set_frame_rate(self, fps: float):
+        """Set the animation frame rate"""
+        self.scheduler.set_fps(fps)
+        print(f"Frame rate set to: {fps:g} FPS")
+
+    def set_overrun_policy(self, overrun_policy: str):
+        """Set how late frames are handled ("skip" or "catchup")"""
+        self.scheduler.set_overrun_policy(overrun_policy)
+        print(f"Overrun policy set to: {overrun_policy}")
+
     def set_strip_active(self, strip_index: int, active: bool):
         """Set strip active state"""
-        if 0 <= strip_index < NUM_STRIPS:
+        if 0 <= strip_index < self.num_strips:
             self.strip_active[strip_index] = active
             print(f"Strip {strip_index + 1} {'activated' if active else 'deactivated'}")
 
@@ -899,32 +958,136 @@ class LEDController:
     def stop(self):
         """Stop the animation loop"""
         self.running = False
-        for sock in self.sockets:
-            if sock:
-                sock.close()
+        self.stop_recording()
+        if self.render_pool:
+            self.render_pool.close()
+        self.transport.close()
         self.encoder.cleanup()  # Cleanup encoder GPIO resources
         self.audio_processor.cleanup()  # Cleanup audio resources
 
+def color_mode(r: int, g: int, b: int):
+    """Render function for a fixed color mode that reacts to music when enabled"""
+    return lambda controller, strip_index: controller.mode_color_reactive(strip_index, r, g, b)
+
+def white_fallback(controller, strip_index: int) -> np.ndarray:
+    """Modes without their own animation yet show white"""
+    return controller.mode_white(strip_index)
+
+# Built-in modes; further effects register the same way
+MODE_REGISTRY.register(Mode(LEDModes.WHITE, "White", LEDController.mode_white, music=True, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.RED, "Red", color_mode(255, 0, 0), music=True, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.YELLOW, "Yellow", color_mode(255, 255, 0), music=True, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.GREEN, "Green", color_mode(0, 255, 0), music=True, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.CYAN, "Cyan", color_mode(0, 255, 255), music=True, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.BLUE, "Blue", color_mode(0, 0, 255), music=True, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.MAGENTA, "Magenta", color_mode(255, 0, 255), music=True, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.SOLID_COLOR, "Solid Color", LEDController.mode_solid_color, advances=('hue',), music=True))
+MODE_REGISTRY.register(Mode(LEDModes.RAINBOW, "Rainbow", LEDController.mode_rainbow, advances=('hue',), cacheable=True))
+MODE_REGISTRY.register(Mode(LEDModes.FIRE, "Fire", LEDController.mode_fire))
+MODE_REGISTRY.register(Mode(LEDModes.AURORA, "Aurora", LEDController.mode_aurora, advances=('aurora_phase',), cacheable=True))
+MODE_REGISTRY.register(Mode(LEDModes.RAINBOW_CHASE, "Rainbow Chase", white_fallback, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.COMET, "Comet", white_fallback, static=True))
+MODE_REGISTRY.register(Mode(LEDModes.TWINKLE, "Twinkle", LEDController.mode_twinkle))
+MODE_REGISTRY.register(Mode(LEDModes.WAVE, "Wave", LEDController.mode_wave, advances=('hue',)))
+MODE_REGISTRY.register(Mode(LEDModes.CHASE, "Chase", LEDController.mode_chase, advances=('hue',)))
+MODE_REGISTRY.register(Mode(LEDModes.BREATHING, "Breathing", LEDController.mode_breathing, advances=('hue',)))
+
+def parse_args():
+    """Parse command line options for the input backends"""
+    parser = argparse.ArgumentParser(description="Raspberry Pi LED Controller")
+    parser.add_argument("--encoder", choices=("gpio", "null", "scripted"), default="gpio",
+                        help="Encoder input: KY-040 on GPIO, none, or a scripted action sequence")
+    parser.add_argument("--script", default="",
+                        help="Comma-separated actions for the scripted encoder, e.g. mode_up,toggle_music_mode")
+    parser.add_argument("--script-interval", type=float, default=1.0,
+                        help="Seconds between scripted encoder actions")
+    parser.add_argument("--audio", choices=AUDIO_BACKENDS, default="mic",
+                        help="Audio input: USB microphone, synthetic signal, WAV file or none")
+    parser.add_argument("--wav", help="WAV file for the wav audio backend")
+    parser.add_argument("--target", help="Send every strip to this host instead of ESP32_IPS (e.g. 127.0.0.1 for esp32_emulator.py)")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Send each frame as MTU-sized chunks (receiver firmware with OP_PIXELS support)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Send only what changed between frames (receiver firmware with OP_FILL/OP_DELTA support)")
+    parser.add_argument("--compress", action="store_true",
+                        help="Compress each frame with RLE or a palette (receiver firmware with OP_CODED support)")
+    parser.add_argument("--latch", action="store_true",
+                        help="Hold frames on the ESP32s until one OP_SHOW latches every strip (receiver firmware with OP_SHOW support)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Serve periodic modes (rainbow, aurora base colors) from a cache of one period per strip length")
+    parser.add_argument("--seed", type=int, help="Seed the random modes (fire, aurora, twinkle) for reproducible output")
+    parser.add_argument("--resend-static", action="store_true",
+                        help="Render and send unchanged static frames every frame instead of as keepalives")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS,
+                        help="Render the strips in this many worker processes (0 renders in the animation thread)")
+    parser.add_argument("--record", help="Record every rendered frame to this file (see frame_recorder.py)")
+    parser.add_argument("--replay", help="Send the frames of a recording at their recorded timing instead of rendering")
+    parser.add_argument("--loop", action="store_true", help="Repeat the --replay recording until stopped")
+    parser.add_argument("--duration", type=float,
+                        help="Run headless for this many seconds, print frame statistics and exit")
+    return parser.parse_args()
+
+def create_encoder(args):
+    """Create the encoder backend selected on the command line"""
+    if args.encoder == "null":
+        return NullEncoder()
+    elif args.encoder == "scripted":
+        actions = [action for action in args.script.split(",") if action]
+        return ScriptedEncoder(actions, args.script_interval)
+    return EncoderHandler()
+
 def main():
     """Main function"""
-    controller = LEDController()
+    args = parse_args()
+    audio_source = create_audio_source(args.audio, SAMPLE_RATE, CHUNK_SIZE, args.wav)
+    # A replay takes its strip lengths from the recording and renders nothing
+    replay = FrameReplay(args.replay) if args.replay else None
+    num_leds_per_strip = replay.num_leds_per_strip if replay else None
+    num_strips = len(num_leds_per_strip) if replay else NUM_STRIPS
+    esp32_ips = [args.target] * num_strips if args.target else None
+    controller = LEDController(encoder=create_encoder(args), audio_source=audio_source, esp32_ips=esp32_ips,
+                               num_leds_per_strip=num_leds_per_strip,
+                               chunked_framing=args.chunked or CHUNKED_FRAMING,
+                               delta_encoding=args.delta or DELTA_ENCODING,
+                               compression=args.compress or COMPRESSION,
+                               sync_latch=args.latch or SYNC_LATCH,
+                               render_workers=0 if replay else args.workers,
+                               animation_cache=args.cache or ANIMATION_CACHE,
+                               seed=args.seed, static_frames=STATIC_FRAMES and not args.resend_static)
+    if args.record:
+        controller.start_recording(args.record)
     
     try:
-        # Start animation loop in separate thread
-        animation_thread = threading.Thread(target=controller.run_animation_loop)
+        # Start animation (or replay) loop in separate thread
+        if replay:
+            animation_thread = threading.Thread(target=controller.run_replay_loop, args=(replay, args.loop))
+        else:
+            animation_thread = threading.Thread(target=controller.run_animation_loop)
         animation_thread.daemon = True
         animation_thread.start()
         
+        if args.duration is not None:
+            # Headless run: no command prompt
+            time.sleep(args.duration)
+            print(controller.scheduler.format_stats())
+            print(controller.transport.format_stats())
+            if controller.animation_cache:
+                print(controller.animation_cache.format_stats())
+            return
+        
         # Simple command interface
         print("LED Controller started. Commands:")
-        print("m <mode> - Set mode (0-16)")
+        print(f"m <mode> - Set mode (0-{len(MODE_REGISTRY) - 1})")
         print("b <brightness> - Set brightness (0-255)")
         print("s <strip> <on/off> - Set strip active state")
         print("t - Toggle music mode enabled")
         print("g - Get music mode state")
+        print("f - Show frame timing and send statistics")
+        print("r <fps> - Set frame rate")
+        print("o <skip/catchup> - Set overrun policy for late frames")
         print("q - Quit")
         print("\nEncoder Controls:")
-        print("- Rotate encoder: Change mode (0-16)")
+        print(f"- Rotate encoder: Change mode (0-{len(MODE_REGISTRY) - 1})")
         print("- Hold button + rotate: Adjust brightness")
         print("- Press and release button (without rotation): Toggle music mode")
         print("\nLED Configuration:")
@@ -933,7 +1096,7 @@ def main():
         print(f"- Strip 3: {NUM_LEDS_PER_STRIP[2]} LEDs")
         print(f"- Total: {TOTAL_LEDS} LEDs")
         print("\nAudio Features:")
-        print("- Music reactive modes: White, Red, Yellow, Green, Cyan, Blue, Magenta, Solid Color")
+        print(f"- Music reactive modes: {', '.join(mode.name for mode in MODE_REGISTRY.music_modes())}")
         print("- Real-time FFT frequency analysis")
         print("- Frequency sections per strip:")
         print(f"  * High frequency: {FREQUENCY_SECTION_PERCENTAGES['high_start']*100:.1f}%-{FREQUENCY_SECTION_PERCENTAGES['high_end']*100:.1f}% and {FREQUENCY_SECTION_PERCENTAGES['high2_start']*100:.1f}%-{FREQUENCY_SECTION_PERCENTAGES['high2_end']*100:.1f}%")
@@ -963,6 +1126,15 @@ def main():
                     controller.toggle_music_mode()
                 elif command[0] == 'g':
                     print(f"Music mode {'enabled' if controller.get_music_mode_enabled() else 'disabled'}")
+                elif command[0] == 'f':
+                    print(controller.scheduler.format_stats())
+                    print(controller.transport.format_stats())
+                    if controller.animation_cache:
+                        print(controller.animation_cache.format_stats())
+                elif command[0] == 'r' and len(command) > 1:
+                    controller.set_frame_rate(float(command[1]))
+                elif command[0] == 'o' and len(command) > 1:
+                    controller.set_overrun_policy(command[1])
                 else:
                     print("Invalid command")
             except (ValueError, IndexError):
@@ -972,6 +1144,8 @@ def main():
     
     finally:
         controller.stop()
+        if replay:
+            replay.close()
         print("LED Controller stopped")
 
 if __name__ == "__main__":
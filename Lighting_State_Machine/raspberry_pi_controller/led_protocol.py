@@ -0,0 +1,348 @@
+"""
+LED packet protocol shared by the controller and the ESP32 emulator
+
+Legacy packets are [strip_id][brightness][R][G][B]... with one packet per frame.
+Extended packets start with an opcode byte of 0x80 or above, which can never be a
+legacy strip id, so receivers accept both formats on the same port.
+
+OP_PIXELS (chunked framing), all integers big-endian:
+    [0]     opcode (0xA1)
+    [1]     strip_id
+    [2]     brightness
+    [3]     flags (FLAG_SHOW: last datagram of the frame, show it;
+                   FLAG_LATCH: last datagram of the frame, hold it until OP_SHOW)
+    [4:6]   frame number (uint16, wraps)
+    [6:8]   pixel offset (uint16)
+    [8:10]  pixel count (uint16)
+    [10:]   RGB x pixel count
+
+OP_FILL (whole strip one color, ends the frame):
+    [0:6]   opcode (0xA2), strip_id, brightness, flags, frame number
+    [6:9]   RGB
+
+OP_DELTA (changed pixel ranges, applied on top of the receiver's current pixels):
+    [0:6]   opcode (0xA3), strip_id, brightness, flags, frame number
+    [6:]    ranges, each [offset uint16][count uint16][RGB x count]
+
+OP_CODED (whole frame in one datagram, ends the frame):
+    [0:6]   opcode (0xA4), strip_id, brightness, flags, frame number
+    [6]     codec
+    [7:9]   pixel count (uint16)
+    [9:]    CODEC_RAW:     RGB x pixel count
+            CODEC_RLE:     runs, each [length uint8 (1-255)][RGB]
+            CODEC_PALETTE: [palette size uint8 (0 means 256)][RGB x palette size][index uint8 x pixel count]
+
+OP_SHOW (two-phase latch, broadcast or sent to every board after all strips' data):
+    [0:6]   opcode (0xA5), strip_id (0xFF: all strips), 0, 0, show number
+    Receivers holding a FLAG_LATCH frame show it; the show number has its own sequence.
+
+Every data opcode sent to a strip shares one frame number sequence.
+"""
+
+import struct
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+
+OP_PIXELS = 0xA1
+OP_FILL = 0xA2
+OP_DELTA = 0xA3
+OP_CODED = 0xA4
+OP_SHOW = 0xA5
+
+SHOW_ALL_STRIPS = 0xFF
+
+CODEC_RAW = 0
+CODEC_RLE = 1
+CODEC_PALETTE = 2
+CODEC_NAMES = {CODEC_RAW: "raw", CODEC_RLE: "rle", CODEC_PALETTE: "palette"}
+
+FLAG_SHOW = 0x01
+FLAG_LATCH = 0x02
+
+CHUNK_HEADER = struct.Struct(">BBBBHHH")
+CHUNK_HEADER_SIZE = CHUNK_HEADER.size
+FRAME_HEADER = struct.Struct(">BBBBH")
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+FILL_PACKET = struct.Struct(">BBBBHBBB")
+FILL_PACKET_SIZE = FILL_PACKET.size
+RANGE_HEADER = struct.Struct(">HH")
+RANGE_HEADER_SIZE = RANGE_HEADER.size
+CODED_HEADER = struct.Struct(">BBBBHBH")
+CODED_HEADER_SIZE = CODED_HEADER.size
+
+MAX_RUN_LENGTH = 255
+MAX_PALETTE_SIZE = 256
+
+# Largest UDP payload that fits a 1500-byte Ethernet/Wi-Fi MTU without IP fragmentation
+MAX_DATAGRAM_PAYLOAD = 1472
+
+KEYFRAME_INTERVAL = 1.0  # Seconds between full frames when delta encoding
+RANGE_MERGE_GAP = 1      # Unchanged pixels bridged instead of starting a new range (a range header is 4 bytes)
+
+def pixels_per_datagram(max_payload: int = MAX_DATAGRAM_PAYLOAD) -> int:
+    """Number of RGB pixels an OP_PIXELS datagram can carry within max_payload bytes"""
+    return (max_payload - CHUNK_HEADER_SIZE) // 3
+
+class ChunkedFramer:
+    """Splits one strip's pixel buffer into OP_PIXELS datagrams that fit within the MTU
+
+    Headers are preallocated and the payloads are memoryview slices of the strip's
+    packet buffer, so a frame is sent as (header, pixels) scatter/gather pairs with
+    no per-frame allocation or copying.
+    """
+
+    def __init__(self, strip_id: int, pixel_view: memoryview, max_payload: int = MAX_DATAGRAM_PAYLOAD,
+                 latch: bool = False):
+        self.strip_id = strip_id
+        self.end_flag = FLAG_LATCH if latch else FLAG_SHOW  # Flag on the datagram that ends a frame
+        self.frame_number = 0
+        self.datagrams: List[Tuple[bytearray, memoryview]] = []
+
+        led_count = len(pixel_view) // 3
+        chunk_pixels = pixels_per_datagram(max_payload)
+        for offset in range(0, led_count, chunk_pixels):
+            count = min(chunk_pixels, led_count - offset)
+            flags = self.end_flag if offset + count == led_count else 0
+            header = bytearray(CHUNK_HEADER_SIZE)
+            CHUNK_HEADER.pack_into(header, 0, OP_PIXELS, strip_id, 0, flags, 0, offset, count)
+            self.datagrams.append((header, pixel_view[offset * 3:(offset + count) * 3]))
+
+    def advance(self) -> int:
+        """Take the next frame number for the strip"""
+        frame_number = self.frame_number
+        self.frame_number = (frame_number + 1) & 0xFFFF
+        return frame_number
+
+    def next_frame(self, brightness: int) -> List[Tuple[bytearray, memoryview]]:
+        """Stamp brightness and the next frame number into the headers and return the datagrams"""
+        frame_number = self.advance()
+        for header, _ in self.datagrams:
+            header[2] = brightness
+            header[4] = frame_number >> 8
+            header[5] = frame_number & 0xFF
+        return self.datagrams
+
+class DeltaEncoder:
+    """Encodes one strip's frames as changes against the last frame sent
+
+    Unchanged frames send nothing, uniform frames send one OP_FILL and anything else
+    sends the changed pixel ranges as OP_DELTA, unless that would be larger than the
+    full frame. UDP has no acknowledgements, so a full OP_PIXELS keyframe every
+    keyframe_interval seconds resyncs a receiver that lost an update or restarted.
+    """
+
+    def __init__(self, framer: ChunkedFramer, pixel_view: memoryview, keyframe_interval: float = KEYFRAME_INTERVAL,
+                 max_payload: int = MAX_DATAGRAM_PAYLOAD, codec: Optional["FrameCodec"] = None):
+        self.framer = framer
+        self.codec = codec  # Compresses keyframes when given
+        self.pixel_view = pixel_view
+        self.frame = np.frombuffer(pixel_view, dtype=np.uint8).reshape(-1, 3)
+        self.previous = np.zeros_like(self.frame)  # What the receiver is showing, as far as the sender knows
+        self.brightness = None
+        self.keyframe_interval = keyframe_interval
+        self.max_payload = max_payload
+        self.next_keyframe = None  # None forces a keyframe
+
+    def reset(self):
+        """Send a keyframe next, e.g. after the receiver was restarted"""
+        self.next_keyframe = None
+
+    def encode(self, brightness: int, now: Optional[float] = None) -> List[tuple]:
+        """Return the datagrams (tuples of buffers for sendmsg) that bring the receiver to the current frame"""
+        now = time.monotonic() if now is None else now
+        frame = self.frame
+        if self.next_keyframe is None or now >= self.next_keyframe or len(frame) == 0:
+            return self.keyframe(brightness, now)
+
+        changed = (frame != self.previous).any(axis=1)
+        if brightness == self.brightness and not changed.any():
+            return []
+        self.brightness = brightness
+
+        if (frame == frame[0]).all():
+            color = frame[0].tolist()
+            datagrams = [(FILL_PACKET.pack(OP_FILL, self.framer.strip_id, brightness, self.framer.end_flag,
+                                           self.framer.advance(), *color),)]
+        else:
+            starts, stops = changed_ranges(changed, RANGE_MERGE_GAP)
+            if int((stops - starts).sum()) * 3 + len(starts) * RANGE_HEADER_SIZE >= len(frame) * 3:
+                return self.keyframe(brightness, now)
+            datagrams = self.pack_ranges(brightness, starts.tolist(), stops.tolist())
+
+        np.copyto(self.previous, frame)
+        return datagrams
+
+    def keyframe(self, brightness: int, now: float) -> List[tuple]:
+        """Send the whole frame, compressed if a codec is set, else as OP_PIXELS chunks"""
+        self.next_keyframe = now + self.keyframe_interval
+        self.brightness = brightness
+        np.copyto(self.previous, self.frame)
+        if self.codec:
+            return self.codec.encode(brightness)
+        return self.framer.next_frame(brightness)
+
+    def pack_ranges(self, brightness: int, starts: List[int], stops: List[int]) -> List[Tuple[bytearray]]:
+        """Pack pixel ranges into as few OP_DELTA datagrams as fit the payload size; the last one shows"""
+        header = FRAME_HEADER.pack(OP_DELTA, self.framer.strip_id, brightness, 0, self.framer.advance())
+        datagrams = []
+        packet = bytearray(header)
+        for start, stop in zip(starts, stops):
+            while start < stop:
+                space = (self.max_payload - len(packet) - RANGE_HEADER_SIZE) // 3
+                if space <= 0:
+                    datagrams.append((packet,))
+                    packet = bytearray(header)
+                    continue
+                count = min(space, stop - start)
+                packet += RANGE_HEADER.pack(start, count)
+                packet += self.pixel_view[start * 3:(start + count) * 3]
+                start += count
+        packet[3] = self.framer.end_flag
+        datagrams.append((packet,))
+        return datagrams
+
+class FrameCodec:
+    """Sends one strip's frames as a single OP_CODED datagram with the smallest of RLE, palette and raw
+
+    Frames that do not fit one datagram with any codec fall back to OP_PIXELS chunks.
+    The datagram is built in a preallocated buffer, reused by the next frame.
+    """
+
+    def __init__(self, framer: ChunkedFramer, pixel_view: memoryview, max_payload: int = MAX_DATAGRAM_PAYLOAD):
+        self.framer = framer
+        self.pixel_view = pixel_view
+        self.frame = np.frombuffer(pixel_view, dtype=np.uint8).reshape(-1, 3)
+        if len(self.frame) > 0xFFFF:
+            raise ValueError(f"{len(self.frame)} LEDs do not fit the 16-bit pixel count of OP_CODED")
+        self.max_payload = max_payload
+        self.packet = bytearray(max_payload)
+        self.packet_view = memoryview(self.packet)
+        self.payload = np.frombuffer(self.packet, dtype=np.uint8)[CODED_HEADER_SIZE:]
+        self.codec_counts = dict.fromkeys(CODEC_NAMES.values(), 0)
+        self.codec_counts['chunked'] = 0
+
+    def encode(self, brightness: int) -> List[tuple]:
+        """Return the datagrams for the current frame"""
+        frame = self.frame
+        led_count = len(frame)
+        raw_size = led_count * 3
+
+        # Runs of identical pixels, split at MAX_RUN_LENGTH
+        run_starts = np.flatnonzero((frame[1:] != frame[:-1]).any(axis=1)) + 1
+        run_starts = np.concatenate(([0], run_starts)) if led_count else run_starts
+        run_lengths = np.diff(np.append(run_starts, led_count))
+        if len(run_lengths) and run_lengths.max() > MAX_RUN_LENGTH:
+            pieces = (run_lengths + MAX_RUN_LENGTH - 1) // MAX_RUN_LENGTH
+            first_piece = np.repeat(np.cumsum(pieces) - pieces, pieces)
+            run_starts = np.repeat(run_starts, pieces) + (np.arange(pieces.sum()) - first_piece) * MAX_RUN_LENGTH
+            run_lengths = np.diff(np.append(run_starts, led_count))
+        rle_size = len(run_starts) * 4
+
+        # A palette needs at least one index byte per pixel, so only try it when it can win
+        palette = None
+        palette_size = raw_size + 1
+        if led_count + 4 < min(rle_size, raw_size):
+            keys = (frame[:, 0].astype(np.uint32) << 16) | (frame[:, 1].astype(np.uint32) << 8) | frame[:, 2]
+            _, first_index, indices = np.unique(keys, return_index=True, return_inverse=True)
+            if len(first_index) <= MAX_PALETTE_SIZE:
+                palette = (frame[first_index], indices)
+                palette_size = 1 + len(first_index) * 3 + led_count
+
+        size = min(raw_size, rle_size, palette_size)
+        if CODED_HEADER_SIZE + size > self.max_payload:
+            self.codec_counts['chunked'] += 1
+            return self.framer.next_frame(brightness)
+
+        payload = self.payload
+        if size == rle_size:
+            codec = CODEC_RLE
+            runs = payload[:rle_size].reshape(-1, 4)
+            runs[:, 0] = run_lengths
+            runs[:, 1:] = frame[run_starts]
+        elif size == palette_size:
+            codec = CODEC_PALETTE
+            colors, indices = palette
+            payload[0] = len(colors) & 0xFF
+            payload[1:1 + len(colors) * 3] = colors.reshape(-1)
+            payload[1 + len(colors) * 3:size] = indices
+        else:
+            codec = CODEC_RAW
+            payload[:raw_size] = frame.reshape(-1)
+
+        CODED_HEADER.pack_into(self.packet, 0, OP_CODED, self.framer.strip_id, brightness, self.framer.end_flag,
+                               self.framer.advance(), codec, led_count)
+        self.codec_counts[CODEC_NAMES[codec]] += 1
+        return [(self.packet_view[:CODED_HEADER_SIZE + size],)]
+
+class ShowLatch:
+    """Builds the OP_SHOW message that makes every receiver holding a frame show it"""
+
+    def __init__(self):
+        self.show_number = 0
+        self.packet = bytearray(FRAME_HEADER_SIZE)
+
+    def next_show(self) -> Tuple[bytearray]:
+        FRAME_HEADER.pack_into(self.packet, 0, OP_SHOW, SHOW_ALL_STRIPS, 0, 0, self.show_number)
+        self.show_number = (self.show_number + 1) & 0xFFFF
+        return (self.packet,)
+
+def decode_coded_frame(data: bytes) -> Tuple[Tuple[int, int, int, int, int, int, int], np.ndarray]:
+    """Unpack an OP_CODED datagram into its header and an (n, 3) pixel array; raises ValueError if malformed"""
+    if len(data) < CODED_HEADER_SIZE:
+        raise ValueError("coded frame too short")
+    header = CODED_HEADER.unpack_from(data)
+    codec, led_count = header[5], header[6]
+    payload = np.frombuffer(data, dtype=np.uint8, offset=CODED_HEADER_SIZE)
+
+    if codec == CODEC_RAW:
+        if len(payload) < led_count * 3:
+            raise ValueError("raw frame shorter than its pixel count")
+        return header, payload[:led_count * 3].reshape(-1, 3)
+
+    if codec == CODEC_RLE:
+        if led_count == 0:
+            return header, payload[:0].reshape(-1, 3)  # An empty strip has no runs
+        runs = payload[:len(payload) // 4 * 4].reshape(-1, 4)
+        ends = np.cumsum(runs[:, 0], dtype=np.int64)
+        run_count = int(np.searchsorted(ends, led_count)) + 1
+        if run_count > len(runs) or ends[run_count - 1] != led_count or not runs[:run_count, 0].all():
+            raise ValueError("RLE runs do not add up to the pixel count")
+        return header, np.repeat(runs[:run_count, 1:], runs[:run_count, 0], axis=0)
+
+    if codec == CODEC_PALETTE:
+        if not len(payload):
+            raise ValueError("palette frame without a palette")
+        palette_size = int(payload[0]) or MAX_PALETTE_SIZE
+        index_start = 1 + palette_size * 3
+        if len(payload) < index_start + led_count:
+            raise ValueError("palette frame shorter than its pixel count")
+        colors = payload[1:index_start].reshape(-1, 3)
+        indices = payload[index_start:index_start + led_count]
+        if led_count and indices.max() >= palette_size:
+            raise ValueError("palette index out of range")
+        return header, colors[indices]
+
+    raise ValueError(f"unknown codec {codec}")
+
+def changed_ranges(changed: np.ndarray, merge_gap: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and stop indices of the runs of True in changed, joining runs separated by merge_gap or fewer"""
+    edges = np.flatnonzero(np.diff(changed.astype(np.int8), prepend=0, append=0))
+    starts, stops = edges[0::2], edges[1::2]
+    if merge_gap and len(starts) > 1:
+        keep = starts[1:] - stops[:-1] > merge_gap
+        starts = np.concatenate((starts[:1], starts[1:][keep]))
+        stops = np.concatenate((stops[:-1][keep], stops[-1:]))
+    return starts, stops
+
+def parse_chunk_header(data: bytes) -> Tuple[int, int, int, int, int, int, int]:
+    """Unpack (opcode, strip_id, brightness, flags, frame_number, offset, count) from an OP_PIXELS datagram"""
+    return CHUNK_HEADER.unpack_from(data)
+
+def parse_frame_header(data: bytes) -> Tuple[int, int, int, int, int]:
+    """Unpack (opcode, strip_id, brightness, flags, frame_number) from any extended datagram"""
+    return FRAME_HEADER.unpack_from(data)
+
+def is_extended(data: bytes) -> bool:
+    """Whether a datagram uses an extended opcode rather than the legacy format"""
+    return bool(data) and data[0] in (OP_PIXELS, OP_FILL, OP_DELTA, OP_CODED, OP_SHOW)
@@ -0,0 +1,61 @@
+"""
+LED mode registry for the LED controller
+Every mode declares how it renders, which animation counters it advances and whether it reacts to music
+or can be cached, so the controller dispatches through one table and new effects register in one place
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+class Mode(NamedTuple):
+    """One LED mode
+
+    render(controller, strip_index) returns the strip's (n_leds, 3) uint8 frame. advances names the
+    AnimationState counters that step once per frame while the mode is shown (animation_step always does).
+    A static mode renders the same frame every time while music mode is off; a cacheable one repeats
+    with its counters, and get_cached_frame() serves it from the animation cache when that is enabled.
+    """
+    mode_id: int
+    name: str
+    render: Callable
+    advances: Tuple[str, ...] = ()
+    music: bool = False
+    static: bool = False
+    cacheable: bool = False
+
+class ModeRegistry:
+    """Modes by id, in the order the encoder cycles through them"""
+
+    def __init__(self, default_mode_id: int = 0):
+        self.modes: Dict[int, Mode] = {}
+        self.default_mode_id = default_mode_id
+
+    def register(self, mode: Mode) -> Mode:
+        """Add a mode, or replace the one registered under the same id"""
+        self.modes[mode.mode_id] = mode
+        self.modes = dict(sorted(self.modes.items()))
+        return mode
+
+    def get(self, mode_id: int) -> Mode:
+        """The mode for an id; unknown ids fall back to the default mode"""
+        mode = self.modes.get(mode_id)
+        return mode if mode is not None else self.modes[self.default_mode_id]
+
+    def cycle(self, mode_id: int, step: int) -> int:
+        """The id step places after mode_id, wrapping around the registered modes"""
+        ids = list(self.modes)
+        index = ids.index(mode_id) if mode_id in ids else ids.index(self.default_mode_id)
+        return ids[(index + step) % len(ids)]
+
+    def music_modes(self) -> List[Mode]:
+        return [mode for mode in self.modes.values() if mode.music]
+
+    def __contains__(self, mode_id: int) -> bool:
+        return mode_id in self.modes
+
+    def __len__(self) -> int:
+        return len(self.modes)
+
+    def __iter__(self):
+        return iter(self.modes.values())
+
+MODE_REGISTRY = ModeRegistry()
@@ -0,0 +1,217 @@
+"""
+Standard output protocols for the LED controller
+DDP and E1.31 (sACN) drivers for off-the-shelf receivers such as WLED or ESPixelStick, selected
+per strip by the scheme of its ESP32_IPS entry, with frame-level sync so every controller latches together
+
+ESP32_IPS entries:
+    192.168.1.101                   custom UDP format (esp32_led_receiver.ino)
+    ddp://192.168.1.101[:4048]      DDP, pixels from offset 0
+    sacn://192.168.1.101[:5568]/1   E1.31 unicast, universes counted up from 1 (the default)
+    sacn://multicast/1              E1.31 multicast to 239.255.<universe hi>.<universe lo>
+"""
+
+import struct
+import uuid
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+import numpy as np
+
+DDP_PORT = 4048
+DDP_VERSION_1 = 0x40
+DDP_FLAG_PUSH = 0x01
+DDP_TYPE_RGB24 = 0x0B
+DDP_ID_DISPLAY = 1
+DDP_MAX_DATA = 1440  # 480 RGB pixels per datagram
+DDP_HEADER = struct.Struct(">BBBBIH")
+
+E131_PORT = 5568
+E131_PIXELS_PER_UNIVERSE = 170  # 510 channels, so no pixel straddles two universes
+E131_SYNC_UNIVERSE = 63999      # Universe the sync packets are sent on
+E131_PRIORITY = 100
+E131_SOURCE_NAME = "Lighting State Machine"
+E131_DATA_HEADER_SIZE = 126
+E131_SYNC_PACKET_SIZE = 49
+E131_ACN_IDENTIFIER = b"ASC-E1.17\x00\x00\x00"
+VECTOR_ROOT_E131_DATA = 0x00000004
+VECTOR_ROOT_E131_EXTENDED = 0x00000008
+VECTOR_E131_DATA_PACKET = 0x00000002
+VECTOR_E131_EXTENDED_SYNCHRONIZATION = 0x00000001
+VECTOR_DMP_SET_PROPERTY = 0x02
+
+# FastLED's scale8 applied to every channel value: SCALE_LUT[brightness][value],
+# so protocols without a brightness field look the same as the custom format
+SCALE_LUT = ((np.arange(256)[:, None] * (np.arange(256)[None, :] + 1)) >> 8).astype(np.uint8).T.copy()
+
+Destination = Tuple[str, int]
+
+def parse_output_target(target: str) -> Tuple[str, str, Optional[int], int]:
+    """Split an ESP32_IPS entry into (protocol, host, port, start universe)
+
+    Plain addresses use the custom format ("native"), whose port the controller supplies.
+    """
+    if "://" not in target:
+        return "native", target, None, 0
+    parts = urlsplit(target)
+    if parts.scheme == "ddp":
+        return "ddp", parts.hostname, parts.port or DDP_PORT, 0
+    if parts.scheme in ("sacn", "e131"):
+        universe = int(parts.path.strip("/") or 1)
+        if not 1 <= universe <= 63999:
+            raise ValueError(f"{target}: E1.31 universes run from 1 to 63999")
+        return "sacn", parts.hostname, parts.port or E131_PORT, universe
+    raise ValueError(f"Unknown output protocol in {target}")
+
+def e131_multicast_address(universe: int) -> str:
+    return f"239.255.{universe >> 8}.{universe & 0xFF}"
+
+class BrightnessScaler:
+    """Applies brightness on the sender for protocols that carry only pixel values"""
+
+    def __init__(self, pixel_view: memoryview):
+        self.pixel_view = pixel_view
+        self.frame = np.frombuffer(pixel_view, dtype=np.uint8)
+        self.buffer = bytearray(len(pixel_view))
+        self.scaled_view = memoryview(self.buffer)
+        self.scaled = np.frombuffer(self.buffer, dtype=np.uint8)
+
+    def scale(self, brightness: int) -> memoryview:
+        """The strip's pixels at this brightness; full brightness sends the frame buffer itself"""
+        if brightness >= 255:
+            return self.pixel_view
+        np.take(SCALE_LUT[brightness], self.frame, out=self.scaled)
+        return self.scaled_view
+
+class SyncGroup:
+    """Frame-level latch packets for every synchronized output
+
+    DDP outputs hold their data until a push packet arrives and E1.31 outputs wait for a
+    universe sync packet; both are sent once per frame after all strips' data, so every
+    receiver shows the frame at the same moment.
+    """
+
+    def __init__(self, enabled: bool = True, sync_universe: int = E131_SYNC_UNIVERSE):
+        self.enabled = enabled
+        self.sync_universe = sync_universe
+        self.cid = uuid.uuid4().bytes  # E1.31 component identifier, one per controller run
+        self.ddp_destinations: List[Destination] = []
+        self.e131_destinations: List[Destination] = []
+        self.ddp_sequence = 0
+        self.e131_sequence = 0
+        self.ddp_push = bytearray(DDP_HEADER.size)
+        self.e131_sync = bytearray(E131_SYNC_PACKET_SIZE)
+        self._build_e131_sync()
+
+    def add_ddp(self, destination: Destination):
+        if destination not in self.ddp_destinations:
+            self.ddp_destinations.append(destination)
+
+    def add_e131(self, host: str, port: int):
+        destination = (e131_multicast_address(self.sync_universe), port) if host == "multicast" else (host, port)
+        if destination not in self.e131_destinations:
+            self.e131_destinations.append(destination)
+
+    def _build_e131_sync(self):
+        packet = self.e131_sync
+        struct.pack_into(">HH12sHI16s", packet, 0, 0x0010, 0x0000, E131_ACN_IDENTIFIER,
+                         0x7000 | (E131_SYNC_PACKET_SIZE - 16), VECTOR_ROOT_E131_EXTENDED, self.cid)
+        struct.pack_into(">HIBHH", packet, 38, 0x7000 | (E131_SYNC_PACKET_SIZE - 38),
+                         VECTOR_E131_EXTENDED_SYNCHRONIZATION, 0, self.sync_universe, 0)
+
+    def datagrams(self) -> List[Tuple[Destination, tuple]]:
+        """The latch packets for the frame just queued"""
+        if not self.enabled:
+            return []
+        datagrams = []
+        if self.ddp_destinations:
+            self.ddp_sequence = self.ddp_sequence % 15 + 1
+            DDP_HEADER.pack_into(self.ddp_push, 0, DDP_VERSION_1 | DDP_FLAG_PUSH, self.ddp_sequence,
+                                 DDP_TYPE_RGB24, DDP_ID_DISPLAY, 0, 0)
+            datagrams.extend((destination, (self.ddp_push,)) for destination in self.ddp_destinations)
+        if self.e131_destinations:
+            self.e131_sync[44] = self.e131_sequence
+            self.e131_sequence = (self.e131_sequence + 1) & 0xFF
+            datagrams.extend((destination, (self.e131_sync,)) for destination in self.e131_destinations)
+        return datagrams
+
+class DDPDriver:
+    """Sends one strip as DDP data packets, pushed at the end of the strip or by the sync group"""
+
+    def __init__(self, host: str, port: int, pixel_view: memoryview, sync: SyncGroup):
+        self.destination = (host, port)
+        self.scaler = BrightnessScaler(pixel_view)
+        self.synchronized = sync.enabled
+        if self.synchronized:
+            sync.add_ddp(self.destination)
+        self.sequence = 0
+
+        # Preallocated headers and (header, slice) pairs over both the raw and the scaled pixels
+        self.headers = []
+        self.raw_datagrams = []
+        self.scaled_datagrams = []
+        length = len(pixel_view)
+        for offset in range(0, length, DDP_MAX_DATA):
+            size = min(DDP_MAX_DATA, length - offset)
+            push = not self.synchronized and offset + size == length
+            header = bytearray(DDP_HEADER.size)
+            DDP_HEADER.pack_into(header, 0, DDP_VERSION_1 | (DDP_FLAG_PUSH if push else 0), 0,
+                                 DDP_TYPE_RGB24, DDP_ID_DISPLAY, offset, size)
+            self.headers.append(header)
+            self.raw_datagrams.append((header, pixel_view[offset:offset + size]))
+            self.scaled_datagrams.append((header, self.scaler.scaled_view[offset:offset + size]))
+
+    def datagrams(self, brightness: int) -> List[Tuple[Destination, tuple]]:
+        pixels = self.scaler.scale(brightness)
+        self.sequence = self.sequence % 15 + 1  # 1-15; 0 means unsequenced
+        for header in self.headers:
+            header[1] = self.sequence
+        datagrams = self.raw_datagrams if pixels is self.scaler.pixel_view else self.scaled_datagrams
+        return [(self.destination, datagram) for datagram in datagrams]
+
+class E131Driver:
+    """Sends one strip as E1.31 data packets, 170 pixels per universe"""
+
+    def __init__(self, host: str, port: int, start_universe: int, pixel_view: memoryview, sync: SyncGroup):
+        self.scaler = BrightnessScaler(pixel_view)
+        self.sequence = 0
+        sync_universe = 0
+        if sync.enabled:
+            sync.add_e131(host, port)
+            sync_universe = sync.sync_universe
+        source_name = E131_SOURCE_NAME.encode()
+
+        self.headers = []
+        self.raw_datagrams = []
+        self.scaled_datagrams = []
+        length = len(pixel_view)
+        channels_per_universe = E131_PIXELS_PER_UNIVERSE * 3
+        for index, offset in enumerate(range(0, length, channels_per_universe)):
+            universe = start_universe + index
+            channels = min(channels_per_universe, length - offset)
+            size = E131_DATA_HEADER_SIZE + channels
+            header = bytearray(E131_DATA_HEADER_SIZE)
+            struct.pack_into(">HH12sHI16s", header, 0, 0x0010, 0x0000, E131_ACN_IDENTIFIER,
+                             0x7000 | (size - 16), VECTOR_ROOT_E131_DATA, sync.cid)
+            struct.pack_into(">HI64sBHBBH", header, 38, 0x7000 | (size - 38), VECTOR_E131_DATA_PACKET,
+                             source_name, E131_PRIORITY, sync_universe, 0, 0, universe)
+            struct.pack_into(">HBBHHHB", header, 115, 0x7000 | (size - 115), VECTOR_DMP_SET_PROPERTY,
+                             0xA1, 0x0000, 0x0001, channels + 1, 0x00)
+            destination = (e131_multicast_address(universe), port) if host == "multicast" else (host, port)
+            self.headers.append(header)
+            self.raw_datagrams.append((destination, (header, pixel_view[offset:offset + channels])))
+            self.scaled_datagrams.append((destination, (header, self.scaler.scaled_view[offset:offset + channels])))
+
+    def datagrams(self, brightness: int) -> List[Tuple[Destination, tuple]]:
+        pixels = self.scaler.scale(brightness)
+        for header in self.headers:
+            header[111] = self.sequence
+        self.sequence = (self.sequence + 1) & 0xFF
+        return self.raw_datagrams if pixels is self.scaler.pixel_view else self.scaled_datagrams
+
+def create_output_driver(target: str, pixel_view: memoryview, sync: SyncGroup):
+    """Create the driver for an ESP32_IPS entry, or None for the custom UDP format"""
+    protocol, host, port, universe = parse_output_target(target)
+    if protocol == "ddp":
+        return DDPDriver(host, port, pixel_view, sync)
+    if protocol == "sacn":
+        return E131Driver(host, port, universe, pixel_view, sync)
+    return None
@@ -0,0 +1,157 @@
+"""
+Multiprocess rendering for the LED controller
+Strips are split round-robin across worker processes, each running its own headless LEDController
+and rendering straight into a shared-memory frame buffer per strip, so expensive modes on large
+installations use every core while the animation thread only schedules, encodes and sends
+"""
+
+import contextlib
+import io
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+from typing import List, Optional
+import numpy as np
+
+RENDER_TIMEOUT = 1.0  # Seconds to wait for a frame before the workers are given up on
+
+# Animation state the workers need each frame; everything else (fire heat, twinkles, aurora
+# intensity) belongs to the strips a worker owns and stays in that worker between frames
+STATE_FIELDS = ("current_mode", "brightness", "hue", "animation_step", "aurora_phase", "aurora_hue",
+                "frequency_bands", "audio_level", "bass_level", "mid_level", "high_level")
+
+def _render_worker(connection, shm_names: dict, num_leds_per_strip: list, animation_cache: bool,
+                   seed: Optional[int]):
+    """Worker process: render the owned strips into shared memory for every frame message"""
+    # Imported here so workers started by spawn or forkserver load the controller themselves
+    from led_controller import LEDController, SAMPLE_RATE
+    from input_backends import NullEncoder, NullAudioSource
+
+    # The random modes draw from per-strip generators seeded from the OS (or from seed), never from
+    # the global state a forked worker shares with its parent, so strips render as they would in process.
+    # Everything a worker does not use is off explicitly, whatever the module defaults say: a daemonic
+    # worker cannot start render workers of its own, and it renders every frame it is sent
+    with contextlib.redirect_stdout(io.StringIO()):
+        controller = LEDController(encoder=NullEncoder(), audio_source=NullAudioSource(SAMPLE_RATE),
+                                   esp32_ips=[], num_leds_per_strip=num_leds_per_strip,
+                                   chunked_framing=False, delta_encoding=False, compression=False,
+                                   sync_latch=False, render_workers=0, animation_cache=animation_cache,
+                                   seed=seed, static_frames=False)
+    # Audio levels arrive with each frame; never overwrite them from the worker's silent source
+    controller.audio_sequence = controller.audio_processor.get_sequence()
+
+    blocks = {}
+    for strip_index, name in shm_names.items():
+        blocks[strip_index] = shared_memory.SharedMemory(name=name)
+        controller.frame_buffers[strip_index] = np.ndarray((num_leds_per_strip[strip_index], 3), dtype=np.uint8,
+                                                           buffer=blocks[strip_index].buf)
+
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            values, strip_active, music_mode_enabled = message
+            for field, value in zip(STATE_FIELDS, values):
+                setattr(controller.state, field, value)
+            controller.strip_active = list(strip_active)
+            controller.music_mode_enabled = music_mode_enabled
+            try:
+                for strip_index in shm_names:
+                    pixels = controller.calculate_led_data(strip_index)
+                    if pixels is not controller.frame_buffers[strip_index]:
+                        controller.frame_buffers[strip_index][:] = pixels
+            except Exception:
+                connection.send(traceback.format_exc())
+                continue
+            connection.send(None)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        controller.frame_buffers = []
+        for block in blocks.values():
+            block.close()
+        controller.transport.close()
+        connection.close()
+
+class RenderPool:
+    """Worker processes that render a frame's strips in parallel into shared memory"""
+
+    def __init__(self, num_leds_per_strip: list, workers: int, animation_cache: bool = False,
+                 seed: Optional[int] = None):
+        self.num_leds_per_strip = list(num_leds_per_strip)
+        workers = max(1, min(workers, len(self.num_leds_per_strip)))
+
+        # One shared-memory block per strip, viewed here as the strip's (n_leds, 3) frame
+        self.blocks = [shared_memory.SharedMemory(create=True, size=max(1, count * 3))
+                       for count in self.num_leds_per_strip]
+        self.frames = [np.ndarray((count, 3), dtype=np.uint8, buffer=block.buf)
+                       for count, block in zip(self.num_leds_per_strip, self.blocks)]
+
+        self.connections = []
+        self.processes = []
+        for worker in range(workers):
+            strips = range(worker, len(self.num_leds_per_strip), workers)
+            shm_names = {strip_index: self.blocks[strip_index].name for strip_index in strips}
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_render_worker, name=f"render-worker-{worker}",
+                                              args=(child_connection, shm_names, self.num_leds_per_strip,
+                                                    animation_cache, seed),
+                                              daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+        self.error = None
+
+    @property
+    def workers(self) -> int:
+        return len(self.processes)
+
+    def render(self, state, strip_active: list, music_mode_enabled: bool) -> Optional[List[np.ndarray]]:
+        """Render one frame for every strip; the frames stay valid until the next call
+
+        Returns None, with the reason in error, if a worker failed, died or missed RENDER_TIMEOUT.
+        """
+        message = (tuple(getattr(state, field) for field in STATE_FIELDS), tuple(strip_active), music_mode_enabled)
+        try:
+            for connection in self.connections:
+                connection.send(message)
+            for connection, process in zip(self.connections, self.processes):
+                if not connection.poll(RENDER_TIMEOUT):
+                    self.error = f"{process.name} did not finish a frame within {RENDER_TIMEOUT:g} s"
+                    return None
+                error = connection.recv()
+                if error is not None:
+                    self.error = f"{process.name} failed:\n{error}"
+                    return None
+        except (EOFError, OSError) as e:
+            self.error = f"Render worker exited: {e}"
+            return None
+        return self.frames
+
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(RENDER_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.processes = []
+
+        self.frames = []
+        for block in self.blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # A frame still being sent holds a view; the mapping goes when it is released
+            block.unlink()
+        self.blocks = []
@@ -0,0 +1,246 @@
+"""
+UDP transport for the LED controller
+Queues every strip's datagrams for a frame and flushes them together from one non-blocking socket,
+in a single sendmmsg call on Linux or one sendmsg per datagram elsewhere, counting errors per destination
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+UIO_MAXIOV = 1024  # Most messages the kernel accepts in one sendmmsg call
+RESOLVE_RETRY_INTERVAL = 1.0  # Seconds before a failed name lookup is tried again
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IOVec)), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+def _load_sendmmsg():
+    """libc's sendmmsg, or None where it is unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+def _c_buffer(buffer) -> ctypes.Array:
+    """A ctypes view of a datagram buffer; read-only buffers such as bytes are copied"""
+    view = memoryview(buffer)
+    if view.readonly:
+        return (ctypes.c_char * view.nbytes).from_buffer_copy(view)
+    return (ctypes.c_char * view.nbytes).from_buffer(view)
+
+class DestinationStats:
+    """Send counters for one strip's destination"""
+
+    def __init__(self, destination: Tuple[str, int]):
+        self.destination = destination
+        self.datagrams = 0
+        self.bytes = 0
+        self.errors = 0       # Failed sends other than a full socket buffer
+        self.would_block = 0  # Dropped because the socket buffer was full
+        self.last_error = None
+
+    def record_error(self, error_number: int):
+        if error_number in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS):
+            self.would_block += 1
+        else:
+            self.errors += 1
+        self.last_error = os.strerror(error_number)
+
+    def to_dict(self) -> dict:
+        return {
+            'destination': f"{self.destination[0]}:{self.destination[1]}",
+            'datagrams': self.datagrams,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'would_block': self.would_block,
+            'last_error': self.last_error,
+        }
+
+class UDPTransport:
+    """Batches a frame's datagrams for all strips and sends them without blocking"""
+
+    def __init__(self, batch: bool = True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)  # For broadcast latch messages
+        self.sendmmsg = _load_sendmmsg() if batch else None
+        self.pending: List[Tuple[object, Tuple[str, int], tuple]] = []
+        self.stats: Dict[object, DestinationStats] = {}  # In first-send order
+        self.addresses: Dict[Tuple[str, int], Tuple[str, int]] = {}  # Resolved once per destination
+        self.resolve_retries: Dict[Tuple[str, int], float] = {}  # Monotonic time of the next lookup after a failure
+        self.sockaddrs: Dict[Tuple[str, int], ctypes.Array] = {}
+        self.flushes = 0
+        self.syscalls = 0
+
+    @property
+    def batched(self) -> bool:
+        return self.sendmmsg is not None
+
+    def queue(self, key, destination: Tuple[str, int], buffers: tuple):
+        """Queue one datagram, given as a tuple of buffers, for the next flush
+
+        Statistics are kept per key (a strip index, or a name for frame-level packets) and destination.
+        The buffers are referenced rather than copied, so they must stay unchanged until flush().
+        """
+        self.pending.append((key, destination, buffers))
+
+    def flush(self) -> int:
+        """Send every queued datagram; returns how many were sent"""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return 0
+        self.flushes += 1
+        if self.sendmmsg:
+            return self._flush_batched(pending)
+        return self._flush_each(pending)
+
+    def get_destination_stats(self, key, destination: Tuple[str, int]) -> DestinationStats:
+        stats = self.stats.get((key, destination))
+        if stats is None:
+            stats = DestinationStats(destination)
+            self.stats[(key, destination)] = stats
+        return stats
+
+    def resolve(self, destination: Tuple[str, int]) -> Optional[Tuple[str, int]]:
+        """Numeric address of a destination, looked up once so sends never wait on DNS
+
+        A failed lookup (e.g. an mDNS name not resolvable yet at boot) returns None and is
+        retried at most every RESOLVE_RETRY_INTERVAL, so the strip comes back once it resolves.
+        """
+        address = self.addresses.get(destination)
+        if address is not None:
+            return address
+        now = time.monotonic()
+        if now < self.resolve_retries.get(destination, 0.0):
+            return None
+        try:
+            address = (socket.gethostbyname(destination[0]), destination[1])
+        except OSError:
+            self.resolve_retries[destination] = now + RESOLVE_RETRY_INTERVAL
+            return None
+        self.resolve_retries.pop(destination, None)
+        self.addresses[destination] = address
+        return address
+
+    def _flush_each(self, pending: list) -> int:
+        sent = 0
+        for key, destination, buffers in pending:
+            stats = self.get_destination_stats(key, destination)
+            address = self.resolve(destination)
+            if address is None:
+                stats.record_error(errno.EDESTADDRREQ)
+                continue
+            self.syscalls += 1
+            try:
+                stats.bytes += self.sock.sendmsg(buffers, (), 0, address)
+                stats.datagrams += 1
+                sent += 1
+            except OSError as e:
+                stats.record_error(e.errno or errno.EIO)
+        return sent
+
+    def _sockaddr(self, address: Tuple[str, int]) -> ctypes.Array:
+        sockaddr = self.sockaddrs.get(address)
+        if sockaddr is None:
+            raw = (struct.pack("=H", socket.AF_INET) + struct.pack(">H", address[1]) +
+                   socket.inet_aton(address[0]) + bytes(8))
+            sockaddr = ctypes.create_string_buffer(raw, len(raw))
+            self.sockaddrs[address] = sockaddr
+        return sockaddr
+
+    def _flush_batched(self, pending: list) -> int:
+        messages = (_MMsgHdr * len(pending))()
+        keep_alive = []  # ctypes views that must outlive the sendmmsg call
+        entries = []
+        for key, destination, buffers in pending:
+            stats = self.get_destination_stats(key, destination)
+            address = self.resolve(destination)
+            if address is None:
+                stats.record_error(errno.EDESTADDRREQ)
+                continue
+            iov = (_IOVec * len(buffers))()
+            for iov_entry, buffer in zip(iov, buffers):
+                c_buffer = _c_buffer(buffer)
+                keep_alive.append(c_buffer)
+                iov_entry.iov_base = ctypes.addressof(c_buffer)
+                iov_entry.iov_len = ctypes.sizeof(c_buffer)
+            keep_alive.append(iov)
+            sockaddr = self._sockaddr(address)
+            header = messages[len(entries)].msg_hdr
+            header.msg_name = ctypes.addressof(sockaddr)
+            header.msg_namelen = ctypes.sizeof(sockaddr)
+            header.msg_iov = iov
+            header.msg_iovlen = len(buffers)
+            entries.append(stats)
+
+        fd = self.sock.fileno()
+        message_size = ctypes.sizeof(_MMsgHdr)
+        sent = 0
+        start = 0
+        while start < len(entries):
+            count = min(len(entries) - start, UIO_MAXIOV)
+            first = ctypes.cast(ctypes.addressof(messages) + start * message_size, ctypes.POINTER(_MMsgHdr))
+            self.syscalls += 1
+            result = self.sendmmsg(fd, first, count, 0)
+            if result <= 0:
+                # The first message failed; record it and carry on with the rest
+                entries[start].record_error(ctypes.get_errno() or errno.EIO)
+                start += 1
+                continue
+            for index in range(start, start + result):
+                entries[index].datagrams += 1
+                entries[index].bytes += messages[index].msg_len
+            sent += result
+            start += result
+        return sent
+
+    def get_stats(self) -> dict:
+        """Per-destination counters and batching totals"""
+        return {
+            'batched': self.batched,
+            'flushes': self.flushes,
+            'syscalls': self.syscalls,
+            'destinations': [dict(stats.to_dict(), key=key) for (key, _), stats in self.stats.items()],
+        }
+
+    def format_stats(self) -> str:
+        """Get one line per destination plus the batching summary"""
+        stats = self.get_stats()
+        mode = "sendmmsg" if stats['batched'] else "sendmsg"
+        per_flush = stats['syscalls'] / stats['flushes'] if stats['flushes'] else 0.0
+        lines = [f"Transport: {mode}, {stats['flushes']} flushes, {per_flush:.2f} syscalls per flush"]
+        for destination in stats['destinations']:
+            key = destination['key']
+            name = f"ESP32 #{key + 1}" if isinstance(key, int) else key
+            line = (f"  {name} {destination['destination']}: {destination['datagrams']} datagrams, "
+                    f"{destination['bytes']} bytes, errors {destination['errors']}, "
+                    f"would block {destination['would_block']}")
+            if destination['last_error']:
+                line += f" (last: {destination['last_error']})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def close(self):
+        self.pending = []
+        self.sock.close()